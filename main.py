@@ -92,6 +92,12 @@ async def debug_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         print(f"DEBUG: Handler log error: {repr(e)}")
 
+async def post_init(application):
+    SignupManager.start_user_writer(application.bot)
+
+async def post_shutdown(application):
+    await SignupManager.stop_user_writer()
+
 def main():
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     if not token:
@@ -142,6 +148,8 @@ def main():
         .connect_timeout(30)\
         .write_timeout(30)\
         .persistence(persistence)\
+        .post_init(post_init)\
+        .post_shutdown(post_shutdown)\
         .build()
     print("DEBUG: Application Built.")
     application.add_error_handler(error_handler)
@@ -173,7 +181,10 @@ def main():
             S_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, SignupManager.handle_name)],
             S_EMAIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, SignupManager.handle_email)],
             S_PHONE: [MessageHandler(filters.TEXT & ~filters.COMMAND, SignupManager.handle_phone)],
-            S_COUNTRY: [MessageHandler(filters.TEXT & ~filters.COMMAND, SignupManager.handle_country)],
+            S_COUNTRY: [
+                CallbackQueryHandler(SignupManager.handle_country, pattern='^country:'),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, SignupManager.handle_country)
+            ],
             # Interview States
             RESEARCH_TITLE: [MessageHandler(filters.TEXT & ~filters.COMMAND, InterviewManager.handle_title)],
             RESEARCH_OBJECTIVES: [MessageHandler(filters.TEXT & ~filters.COMMAND, InterviewManager.handle_objectives)],
@@ -190,13 +201,31 @@ def main():
             # Save Project State
             SAVE_PROJECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, save_project_handler)],
             
-            # Sampling States
-            MODE_SELECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, mode_select_handler)],
-            STUDY_TYPE_SELECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, study_type_handler)],
-            POPULATION_CHECK: [MessageHandler(filters.TEXT & ~filters.COMMAND, population_check_handler)],
-            METHOD_SELECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, method_select_handler)],
-            CI_SELECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, ci_select_handler)],
-            PARAM_INPUT: [MessageHandler(filters.TEXT & ~filters.COMMAND, param_input_handler)],
+            # Sampling States (inline buttons, typed text still accepted)
+            MODE_SELECT: [
+                CallbackQueryHandler(mode_select_handler, pattern='^mode:'),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, mode_select_handler)
+            ],
+            STUDY_TYPE_SELECT: [
+                CallbackQueryHandler(study_type_handler, pattern='^study:'),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, study_type_handler)
+            ],
+            POPULATION_CHECK: [
+                CallbackQueryHandler(population_check_handler, pattern='^pop:'),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, population_check_handler)
+            ],
+            METHOD_SELECT: [
+                CallbackQueryHandler(method_select_handler, pattern='^method:'),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, method_select_handler)
+            ],
+            CI_SELECT: [
+                CallbackQueryHandler(ci_select_handler, pattern='^ci:'),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, ci_select_handler)
+            ],
+            PARAM_INPUT: [
+                CallbackQueryHandler(param_input_handler, pattern='^(margin|effect):'),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, param_input_handler)
+            ],
             
             # Analysis States (New)
             TEST_SELECT: [MessageHandler(filters.TEXT & ~filters.COMMAND, test_select_handler)],
@@ -250,8 +279,21 @@ def main():
     application.add_handler(PreCheckoutQueryHandler(pre_checkout_handler))
     application.add_handler(MessageHandler(filters.SUCCESSFUL_PAYMENT, successful_payment_handler))
 
-    print("QuantiProBot is running...")
-    application.run_polling()
+    # Ingress: webhook when a public URL is configured, otherwise long polling.
+    # A 30s long-poll keeps one request open instead of re-polling every few seconds.
+    webhook_url = os.getenv("WEBHOOK_URL")
+    if webhook_url:
+        port = int(os.getenv("WEBHOOK_PORT", "8443"))
+        print(f"QuantiProBot is running (webhook on port {port})...")
+        application.run_webhook(
+            listen='0.0.0.0',
+            port=port,
+            url_path=token,
+            webhook_url=f"{webhook_url.rstrip('/')}/{token}"
+        )
+    else:
+        print("QuantiProBot is running...")
+        application.run_polling(timeout=30)
 
 if __name__ == '__main__':
     try:
@@ -42,3 +42,29 @@ ANOVA_SELECT_DV = 74
 RELIABILITY_SELECT = 75
 GUIDE_CONFIRM = 76
 CHART_CONFIG = 77
+
+# User guide shown by /help and appended to the signup welcome
+HELP_TEXT = (
+    "📖 **QuantiProBot User Guide**\n\n"
+    "QuantiProBot is your advanced AI-powered data analyst. Here's how to use it:\n\n"
+    "🚀 **Getting Started**\n"
+    "1. Send /start to begin.\n"
+    "2. Upload your dataset (.csv, .xlsx, .sav, .dta).\n"
+    "3. Select what you'd like to do from the menu.\n\n"
+    "📋 **Core Commands**\n"
+    "• /start - Main menu / Upload data\n"
+    "• /profile - View and edit your info\n"
+    "• /plans - Upgrade your subscription\n"
+    "• /history - View/Continue past projects\n"
+    "• /help - Show this guide\n"
+    "• /cancel - Abort current action\n\n"
+    "🏢 **Institutional Plans**\n"
+    "If you are part of a team, use:\n"
+    "• `/join CODE` - Join using an invite code\n\n"
+    "📊 **Analytical Features**\n"
+    "• **AI Chat**: Ask questions about your data in plain English.\n"
+    "• **Regression**: Linear, Logistic, and Multiple regression analysis.\n"
+    "• **Correlation**: Multi-select variables to see relation matrix with p-values.\n"
+    "• **Generate Report**: Create a full academic manuscript (Word doc).\n\n"
+    "Need more help? Contact @QuantiProSupport"
+)
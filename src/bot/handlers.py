@@ -14,7 +14,8 @@ from src.core.visualizer import Visualizer
 from src.bot.constants import (
     UPLOAD, ACTION, MANUSCRIPT_REVIEW, VISUAL_SELECT, SAVE_PROJECT,
     RESEARCH_TITLE, RESEARCH_OBJECTIVES, RESEARCH_QUESTIONS, RESEARCH_HYPOTHESIS,
-    GOAL_SELECT, VAR_SELECT_1, VAR_SELECT_2, CONFIRM_ANALYSIS, POST_ANALYSIS
+    GOAL_SELECT, VAR_SELECT_1, VAR_SELECT_2, CONFIRM_ANALYSIS, POST_ANALYSIS,
+    HELP_TEXT
 )
 from src.bot.interview import InterviewManager
 from src.bot.signup import SignupManager
@@ -162,6 +163,10 @@ async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         user_id = update.effective_user.id
         print(f"--- START HANDLER TRIGGERED FOR {user_id} ---")
+        # A just-completed signup may still be queued for the database; don't restart signup over it
+        if await SignupManager.wait_for_signup(user_id):
+            await update.message.reply_text("⏳ Your registration is still being saved. Please try again in a moment.")
+            return ConversationHandler.END
         db = DatabaseManager()
         user = db.get_user(user_id)
 
@@ -244,6 +249,9 @@ async def file_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return UPLOAD
 
     user_id = update.message.from_user.id
+    if await SignupManager.wait_for_signup(user_id):
+        await update.message.reply_text("⏳ Your registration is still being saved. Please try again in a moment.")
+        return UPLOAD
     db = DatabaseManager()
     user_db = db.get_user(user_id)
     
@@ -2362,17 +2370,27 @@ async def manuscript_review_handler(update: Update, context: ContextTypes.DEFAUL
                 # Generate AI discussion (Simplified but technical)
                 try:
                     interpreter = AIInterpreter()
-                    discussion = await interpreter.generate_discussion(
-                        title=context.user_data.get('research_title', 'Statistical Analysis'),
-                        objectives=context.user_data.get('research_objectives', 'N/A'),
-                        questions=context.user_data.get('research_questions', 'N/A'),
-                        hypotheses=context.user_data.get('research_hypothesis', 'N/A'),
-                        analysis_history=analysis_history,
-                        descriptive_stats=desc_res,
-                        min_word_count=settings.get('min_word_count', 1500),
-                        max_word_count=settings.get('max_word_count', 2500),
-                        style_hint="technical but simple to understand, use academic prose, enrich with clear narratives"
-                    )
+                    # Live word count only when the reply is actually streamed (API key set)
+                    progress = await update.message.reply_text("✍️ Writing the discussion...") if interpreter.api_key else None
+                    try:
+                        discussion = await interpreter.generate_discussion(
+                            title=context.user_data.get('research_title', 'Statistical Analysis'),
+                            objectives=context.user_data.get('research_objectives', 'N/A'),
+                            questions=context.user_data.get('research_questions', 'N/A'),
+                            hypotheses=context.user_data.get('research_hypothesis', 'N/A'),
+                            analysis_history=analysis_history,
+                            descriptive_stats=desc_res,
+                            min_word_count=settings.get('min_word_count', 1500),
+                            max_word_count=settings.get('max_word_count', 2500),
+                            style_hint="technical but simple to understand, use academic prose, enrich with clear narratives",
+                            on_progress=(lambda words: progress.edit_text(f"✍️ Writing the discussion... ~{words} words so far")) if progress else None
+                        )
+                    finally:
+                        if progress:
+                            try:
+                                await progress.delete()
+                            except Exception:
+                                pass # Status message already gone or too old to delete
                 except Exception as ai_e:
                     print(f"AI Discussion Error: {ai_e}")
                     discussion = "AI Discussion could not be generated."
@@ -3147,31 +3165,7 @@ async def profile_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comprehensive help guide for QuantiProBot."""
-    help_text = (
-        "📖 **QuantiProBot User Guide**\n\n"
-        "QuantiProBot is your advanced AI-powered data analyst. Here's how to use it:\n\n"
-        "🚀 **Getting Started**\n"
-        "1. Send /start to begin.\n"
-        "2. Upload your dataset (.csv, .xlsx, .sav, .dta).\n"
-        "3. Select what you'd like to do from the menu.\n\n"
-        "📋 **Core Commands**\n"
-        "• /start - Main menu / Upload data\n"
-        "• /profile - View and edit your info\n"
-        "• /plans - Upgrade your subscription\n"
-        "• /history - View/Continue past projects\n"
-        "• /help - Show this guide\n"
-        "• /cancel - Abort current action\n\n"
-        "🏢 **Institutional Plans**\n"
-        "If you are part of a team, use:\n"
-        "• `/join CODE` - Join using an invite code\n\n"
-        "📊 **Analytical Features**\n"
-        "• **AI Chat**: Ask questions about your data in plain English.\n"
-        "• **Regression**: Linear, Logistic, and Multiple regression analysis.\n"
-        "• **Correlation**: Multi-select variables to see relation matrix with p-values.\n"
-        "• **Generate Report**: Create a full academic manuscript (Word doc).\n\n"
-        "Need more help? Contact @QuantiProSupport"
-    )
-    await update.message.reply_text(help_text, parse_mode='Markdown')
+    await update.message.reply_text(HELP_TEXT, parse_mode='Markdown')
 
 async def ping_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Simple connectivity test."""
@@ -3256,6 +3250,9 @@ async def profile_callback_handler(update: Update, context: ContextTypes.DEFAULT
 
 
 async def signup_command_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if await SignupManager.wait_for_signup(update.effective_user.id):
+        await update.message.reply_text("⏳ Your registration is still being saved. Please try again in a moment.")
+        return ConversationHandler.END
     return await SignupManager.start_signup(update, context)
 
 
@@ -698,14 +698,24 @@ class InterviewManager:
                 
                 # Generate AI Discussion section
                 interpreter = AIInterpreter()
-                discussion_text = await interpreter.generate_discussion(
-                    title=context.user_data.get('research_title', 'Statistical Analysis'),
-                    objectives=context.user_data.get('research_objectives', 'N/A'),
-                    questions=context.user_data.get('research_questions', 'N/A'),
-                    hypotheses=context.user_data.get('research_hypothesis', 'N/A'),
-                    analysis_history=analysis_history,
-                    descriptive_stats=desc_res
-                )
+                # Live word count only when the reply is actually streamed (API key set)
+                progress = await update.message.reply_text("✍️ Writing the discussion...") if interpreter.api_key else None
+                try:
+                    discussion_text = await interpreter.generate_discussion(
+                        title=context.user_data.get('research_title', 'Statistical Analysis'),
+                        objectives=context.user_data.get('research_objectives', 'N/A'),
+                        questions=context.user_data.get('research_questions', 'N/A'),
+                        hypotheses=context.user_data.get('research_hypothesis', 'N/A'),
+                        analysis_history=analysis_history,
+                        descriptive_stats=desc_res,
+                        on_progress=(lambda words: progress.edit_text(f"✍️ Writing the discussion... ~{words} words so far")) if progress else None
+                    )
+                finally:
+                    if progress:
+                        try:
+                            await progress.delete()
+                        except Exception:
+                            pass # Status message already gone or too old to delete
                 
                 from src.bot.handlers import DATA_DIR
                 base_name = os.path.basename(file_path).replace('.', '_')
@@ -1,5 +1,7 @@
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram import Update, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup
+import asyncio
 import math
+import re
 from telegram.ext import ContextTypes, ConversationHandler
 from src.core.sampler import Sampler
 
@@ -7,29 +9,113 @@ from src.bot.constants import (
     MODE_SELECT, STUDY_TYPE_SELECT, METHOD_SELECT, POPULATION_CHECK, CI_SELECT, PARAM_INPUT
 )
 
+# Menu routing: one compiled alternation per state, the matched token keys the branch.
+# Inline buttons carry the same token as "<state>:<token>" callback data.
+_MODE_RE = re.compile(r'(Back|Help me choose|Direct)')
+_STUDY_RE = re.compile(r'(Back|Cross-sectional|Experimental|Correlational)')
+_POPULATION_RE = re.compile(r'(Back|Yes|No|Unsure|Specific|General)')
+_METHOD_RE = re.compile(r'(Back|Cochran|Yamane|Power)')
+_CI_RE = re.compile(r'(Back|95%|99%|90%)')
+_MARGIN_RE = re.compile(r'(5%|1%|Custom)')
+_EFFECT_RE = re.compile(r'(Small|Medium|Large|Custom)')
+
+# Per-flow keys; the rest of user_data (uploaded file, history) must survive
+_SAMPLING_KEYS = ('sampling_method', 'awaiting_param', 'param_N', 'effect_size')
+
+_MARGINS = {'5%': 0.05, '1%': 0.01}
+_EFFECT_SIZES = {'Small': 0.2, 'Medium': 0.5, 'Large': 0.8}
+
+def _end_sampling(context: ContextTypes.DEFAULT_TYPE):
+    """Drops the sampling flow state and ends the conversation; /start re-renders the menu."""
+    for key in _SAMPLING_KEYS:
+        context.user_data.pop(key, None)
+    return ConversationHandler.END
+
+def _route(pattern: re.Pattern, text: str):
+    """Returns the menu token found in text, or None."""
+    m = pattern.search(text)
+    return m.group(1) if m else None
+
+async def _incoming_text(update: Update) -> str:
+    """Returns the token of a pressed inline button, or the typed message text."""
+    query = update.callback_query
+    if query:
+        await query.answer()
+        return query.data.split(':', 1)[1]
+    return update.message.text
+
+def _inline_kb(prefix: str, rows: list) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(label, callback_data=f"{prefix}:{token}") for label, token in row]
+        for row in rows
+    ])
+
+# Static keyboards are built once at import and shared by every chat
+_MODE_KB = _inline_kb('mode', [
+    [('🎓 Help me choose (Study Design)', 'Help me choose')],
+    [('🛠️ I know the method (Direct Selection)', 'Direct')],
+    [('◀️ Back to Main Menu', 'Back')]
+])
+
+_STUDY_KB = _inline_kb('study', [
+    [('1. Cross-sectional (Survey)', 'Cross-sectional')],
+    [('2. Experimental (Comparison)', 'Experimental')],
+    [('3. Correlational', 'Correlational')],
+    [('◀️ Back', 'Back')]
+])
+
+_METHOD_KB = _inline_kb('method', [
+    [('Cochran (Proportions)', 'Cochran'), ('Yamane (Finite Pop)', 'Yamane')],
+    [('Power Analysis (T-Test)', 'Power')],
+    [('◀️ Back', 'Back')]
+])
+
+_POPULATION_KB = _inline_kb('pop', [
+    [('Yes, I know N (Finite)', 'Yes'), ('No / General Public (Infinite)', 'No')],
+    [('Unsure (Help me decide)', 'Unsure')],
+    [('◀️ Back', 'Back')]
+])
+
+_POPULATION_GUIDE_KB = _inline_kb('pop', [
+    [('Specific/Listable (Finite)', 'Specific'), ('General/Uncountable (Infinite)', 'General')],
+    [('◀️ Back', 'Back')]
+])
+
+_YES_NO_KB = _inline_kb('pop', [[('Yes', 'Yes'), ('No', 'No')]])
+
+_EFFECT_SIZE_KB = _inline_kb('effect', [
+    [('Small (0.2)', 'Small'), ('Medium (0.5)', 'Medium'), ('Large (0.8)', 'Large')],
+    [('Custom', 'Custom')]
+])
+
+_CI_KB = _inline_kb('ci', [
+    [('95% (Standard)', '95%'), ('99% (High Precision)', '99%'), ('90%', '90%')],
+    [('◀️ Back', 'Back')]
+])
+
+_MARGIN_KB = _inline_kb('margin', [[('5% (0.05)', '5%'), ('1% (0.01)', '1%')], [('Custom', 'Custom')]])
+
+_KB_REMOVE = ReplyKeyboardRemove()
+
 async def start_sampling(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Entry point: Ask for Mode (Guided vs Direct)."""
-    await update.message.reply_text(
+    await update.effective_message.reply_text(
         "🔢 **Sample Size Calculator**\n\n"
         "How would you like to proceed?",
         parse_mode='Markdown',
-        reply_markup=ReplyKeyboardMarkup([
-            ['🎓 Help me choose (Study Design)'],
-            ['🛠️ I know the method (Direct Selection)'],
-            ['◀️ Back to Main Menu']
-        ], one_time_keyboard=True)
+        reply_markup=_MODE_KB
     )
     return MODE_SELECT
 
 async def mode_select_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    choice = update.message.text
+    choice = _route(_MODE_RE, await _incoming_text(update))
     
-    if 'Back' in choice:
-        await update.message.reply_text("Teleporting to Main Menu... use /start to restart.", reply_markup=ReplyKeyboardRemove())
+    if choice == 'Back':
+        await update.effective_message.reply_text("Teleporting to Main Menu... use /start to restart.", reply_markup=_KB_REMOVE)
         return ConversationHandler.END
 
-    if 'Help me choose' in choice:
-        await update.message.reply_text(
+    if choice == 'Help me choose':
+        await update.effective_message.reply_text(
             "🎓 **Select your Study Design:**\n\n"
             "1. **Cross-sectional / Survey**\n"
             "   _One-time data collection (e.g., opinion poll, prevalence)_.\n"
@@ -38,168 +124,146 @@ async def mode_select_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             "3. **Correlational**\n"
             "   _Relationships between variables_.",
             parse_mode='Markdown',
-            reply_markup=ReplyKeyboardMarkup([
-                ['1. Cross-sectional (Survey)'],
-                ['2. Experimental (Comparison)'],
-                ['3. Correlational'],
-                ['◀️ Back']
-            ], one_time_keyboard=True)
+            reply_markup=_STUDY_KB
         )
         return STUDY_TYPE_SELECT
     
-    elif 'Direct' in choice:
-        await update.message.reply_text(
+    elif choice == 'Direct':
+        await update.effective_message.reply_text(
             "🛠️ **Select Statistical Method:**",
-            reply_markup=ReplyKeyboardMarkup([
-                ['Cochran (Proportions)', 'Yamane (Finite Pop)'],
-                ['Power Analysis (T-Test)'],
-                ['◀️ Back']
-            ], one_time_keyboard=True)
+            reply_markup=_METHOD_KB
         )
         return METHOD_SELECT
     
     return await start_sampling(update, context)
 
 async def study_type_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    choice = update.message.text
-    if 'Back' in choice: return await start_sampling(update, context)
+    choice = _route(_STUDY_RE, await _incoming_text(update))
+    if choice == 'Back': return await start_sampling(update, context)
 
-    if 'Cross-sectional' in choice:
+    if choice == 'Cross-sectional':
         # Map to Cochran, but first check Population
         context.user_data['sampling_method'] = 'cochran'
-        await update.message.reply_text(
+        await update.effective_message.reply_text(
             "📋 **Cross-sectional Study**\n"
             "Typically uses **Cochran's Formula**.\n\n"
             "**Question:** Do you know the exact size of your target population?",
             parse_mode='Markdown',
-            reply_markup=ReplyKeyboardMarkup([
-                ['Yes, I know N (Finite)', 'No / General Public (Infinite)'],
-                ['Unsure (Help me decide)'],
-                ['◀️ Back']
-            ], one_time_keyboard=True)
+            reply_markup=_POPULATION_KB
         )
         return POPULATION_CHECK
 
-    elif 'Experimental' in choice:
+    elif choice == 'Experimental':
         # Map to Power Analysis
         context.user_data['sampling_method'] = 'power'
-        await update.message.reply_text("🧪 **Experimental Study**\nUsing **Power Analysis** to detect effects.")
+        await update.effective_message.reply_text("🧪 **Experimental Study**\nUsing **Power Analysis** to detect effects.")
         return await ask_power_params(update)
 
-    elif 'Correlational' in choice:
+    elif choice == 'Correlational':
         # Simplified: Map to Power Analysis for now (or could use specific corr formula)
         context.user_data['sampling_method'] = 'power'
-        await update.message.reply_text("📈 **Correlational Study**\nUsing **Power Analysis**.")
+        await update.effective_message.reply_text("📈 **Correlational Study**\nUsing **Power Analysis**.")
         return await ask_power_params(update)
     
     else:
-        await update.message.reply_text("Please make a selection.")
+        await update.effective_message.reply_text("Please make a selection.")
         return STUDY_TYPE_SELECT
 
 async def population_check_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    choice = update.message.text
-    if 'Back' in choice: return MODE_SELECT # Go back start
+    choice = _route(_POPULATION_RE, await _incoming_text(update))
+    if choice == 'Back': return MODE_SELECT # Go back start
 
-    if 'Yes' in choice:
+    if choice == 'Yes':
         # Finite Population
         context.user_data['sampling_method'] = 'cochran' # Use Cochran with correction
-        await update.message.reply_text("Please enter the **Population Size (N)**:")
+        await update.effective_message.reply_text("Please enter the **Population Size (N)**:")
         context.user_data['awaiting_param'] = 'cochran_N'
         return PARAM_INPUT
     
-    elif 'No' in choice:
+    elif choice == 'No':
         # Infinite
         context.user_data['sampling_method'] = 'cochran'
         context.user_data['param_N'] = None
         return await ask_confidence_interval(update)
 
-    elif 'Unsure' in choice:
+    elif choice == 'Unsure':
         # Guided question
-        await update.message.reply_text(
+        await update.effective_message.reply_text(
             "🤔 **Let's figure it out.**\n\n"
             "Is your study targeting a **specific, listable group** (e.g., 'Employees of Google', 'Students at X High School')?\n"
             "OR\n"
             "A **general/uncountable group** (e.g., 'Residents of NY', 'iPhone users')?",
             parse_mode='Markdown',
-            reply_markup=ReplyKeyboardMarkup([
-                ['Specific/Listable (Finite)', 'General/Uncountable (Infinite)'],
-                ['◀️ Back']
-            ], one_time_keyboard=True)
+            reply_markup=_POPULATION_GUIDE_KB
         )
         return POPULATION_CHECK # Loop back with simplified choice
 
-    elif 'Specific' in choice:
-        await update.message.reply_text("Since it's a specific group, we treat it as **Finite**.\n\nPlease estimate the **Population Size (N)**:")
+    elif choice == 'Specific':
+        await update.effective_message.reply_text("Since it's a specific group, we treat it as **Finite**.\n\nPlease estimate the **Population Size (N)**:")
         context.user_data['awaiting_param'] = 'cochran_N'
         return PARAM_INPUT
         
-    elif 'General' in choice:
-        await update.message.reply_text("Since it's a general group, we treat it as **Infinite**.")
+    elif choice == 'General':
+        await update.effective_message.reply_text("Since it's a general group, we treat it as **Infinite**.")
         context.user_data['param_N'] = None
         return await ask_confidence_interval(update)
     
     return POPULATION_CHECK
 
 async def method_select_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    choice = update.message.text
-    if 'Back' in choice: return await start_sampling(update, context)
+    choice = _route(_METHOD_RE, await _incoming_text(update))
+    if choice == 'Back': return await start_sampling(update, context)
 
-    if 'Cochran' in choice:
+    if choice == 'Cochran':
         context.user_data['sampling_method'] = 'cochran'
-        await update.message.reply_text("Use Finite Population Correction?", 
-            reply_markup=ReplyKeyboardMarkup([['Yes', 'No']], one_time_keyboard=True))
+        await update.effective_message.reply_text("Use Finite Population Correction?", 
+            reply_markup=_YES_NO_KB)
         return POPULATION_CHECK # Re-use the Yes/No logic logic roughly or redirect
 
-    elif 'Yamane' in choice:
+    elif choice == 'Yamane':
         context.user_data['sampling_method'] = 'yamane'
-        await update.message.reply_text("Enter **Population Size (N)**:")
+        await update.effective_message.reply_text("Enter **Population Size (N)**:")
         context.user_data['awaiting_param'] = 'yamane_N'
         return PARAM_INPUT
 
-    elif 'Power' in choice:
+    elif choice == 'Power':
         context.user_data['sampling_method'] = 'power'
         return await ask_power_params(update)
 
     return METHOD_SELECT
 
 async def ask_power_params(update: Update):
-    await update.message.reply_text(
+    await update.effective_message.reply_text(
         "**Power Analysis Parameters**\n\n"
         "We need the **Effect Size** (magnitude of difference).\n"
         "• Small: 0.2\n• Medium: 0.5 (Standard)\n• Large: 0.8",
         parse_mode='Markdown',
-        reply_markup=ReplyKeyboardMarkup([
-            ['Small (0.2)', 'Medium (0.5)', 'Large (0.8)'],
-            ['Custom']
-        ], one_time_keyboard=True)
+        reply_markup=_EFFECT_SIZE_KB
     )
     return PARAM_INPUT
 
 async def ask_confidence_interval(update: Update):
     # Educational Pre-text
-    await update.message.reply_text(
+    await update.effective_message.reply_text(
         "⚙️ **Parameters Considered:**\n"
         "• **Confidence Level (Z)**: How sure you want to be.\n"
         "• **Precision (e)**: Margin of error (Standard is 5%).\n\n"
         "Select **Confidence Level**:",
         parse_mode='Markdown',
-        reply_markup=ReplyKeyboardMarkup([
-            ['95% (Standard)', '99% (High Precision)', '90%'],
-            ['◀️ Back']
-        ], one_time_keyboard=True)
+        reply_markup=_CI_KB
     )
     return CI_SELECT
 
 async def param_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = update.message.text
+    text = await _incoming_text(update)
     method = context.user_data.get('sampling_method')
     
-    if text == '◀️ Back': return await start_sampling(update, context)
+    if text == '◀️ Back': return _end_sampling(context)
 
     # 1. COCHRAN N INPUT
     if method == 'cochran' and context.user_data.get('awaiting_param') == 'cochran_N':
         if not text.isdigit():
-             await update.message.reply_text("⚠️ Enter a valid number for N.")
+             await update.effective_message.reply_text("⚠️ Enter a valid number for N.")
              return PARAM_INPUT
         context.user_data['param_N'] = int(text)
         context.user_data['awaiting_param'] = None
@@ -209,67 +273,66 @@ async def param_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     if method == 'yamane':
         if context.user_data.get('awaiting_param') == 'yamane_N':
             if not text.isdigit():
-                await update.message.reply_text("⚠️ Enter a valid number.")
+                await update.effective_message.reply_text("⚠️ Enter a valid number.")
                 return PARAM_INPUT
             context.user_data['param_N'] = int(text)
             
-            await update.message.reply_text("Select **Margin of Error (e)**:",
-                reply_markup=ReplyKeyboardMarkup([['5% (0.05)', '1% (0.01)'], ['Custom']], one_time_keyboard=True))
+            await update.effective_message.reply_text("Select **Margin of Error (e)**:",
+                reply_markup=_MARGIN_KB)
             context.user_data['awaiting_param'] = 'yamane_e'
             return PARAM_INPUT
             
         if context.user_data.get('awaiting_param') == 'yamane_e':
-            e_val = 0.05
-            if '1%' in text: e_val = 0.01
-            elif 'Custom' in text:
-                 await update.message.reply_text("Enter e (e.g. 0.05):")
+            choice = _route(_MARGIN_RE, text)
+            if choice in _MARGINS: e_val = _MARGINS[choice]
+            elif choice == 'Custom':
+                 await update.effective_message.reply_text("Enter e (e.g. 0.05):")
                  return PARAM_INPUT
             else:
                 try: e_val = float(text)
                 except: return PARAM_INPUT
             
             N = context.user_data['param_N']
-            result = Sampler.calculate_yamane(N, e_val)
-            await display_result(update, result)
+            result = await asyncio.to_thread(Sampler.calculate_yamane, N, e_val)
+            await display_result(update, context, result)
             return ConversationHandler.END
 
     # 3. POWER FLOW
     if method == 'power':
-        if 'Small' in text: context.user_data['effect_size'] = 0.2
-        elif 'Medium' in text: context.user_data['effect_size'] = 0.5
-        elif 'Large' in text: context.user_data['effect_size'] = 0.8
-        elif 'Custom' in text:
-             await update.message.reply_text("Enter effect size:")
+        choice = _route(_EFFECT_RE, text)
+        if choice in _EFFECT_SIZES: context.user_data['effect_size'] = _EFFECT_SIZES[choice]
+        elif choice == 'Custom':
+             await update.effective_message.reply_text("Enter effect size:")
              return PARAM_INPUT
         else:
              try: context.user_data['effect_size'] = float(text)
              except: return PARAM_INPUT
         
         es = context.user_data['effect_size']
-        result = Sampler.calculate_power_ttest(effect_size=es)
-        await display_result(update, result)
+        result = await asyncio.to_thread(Sampler.calculate_power_ttest, effect_size=es)
+        await display_result(update, context, result)
         return ConversationHandler.END
 
     return PARAM_INPUT
 
 async def ci_select_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    text = update.message.text
-    if 'Back' in text: return await start_sampling(update, context)
+    choice = _route(_CI_RE, await _incoming_text(update))
+    if choice == 'Back': return _end_sampling(context)
     
-    ci = '95%'
-    if '99%' in text: ci = '99%'
-    if '90%' in text: ci = '90%'
+    ci = choice or '95%'
     
     N = context.user_data.get('param_N')
     # Default margin of error 0.05 for Cochran in this simplified flow
-    result = Sampler.calculate_cochran(confidence_level=ci, N=N, e=0.05)
+    # Calculators run off the event loop so other chats keep being served
+    result = await asyncio.to_thread(Sampler.calculate_cochran, confidence_level=ci, N=N, e=0.05)
     
-    await display_result(update, result)
+    await display_result(update, context, result)
     return ConversationHandler.END
 
-async def display_result(update: Update, result: dict):
+async def display_result(update: Update, context: ContextTypes.DEFAULT_TYPE, result: dict):
     if 'error' in result:
-        await update.message.reply_text(f"❌ Error: {result['error']}")
+        await update.effective_message.reply_text(f"❌ Error: {result['error']}")
+        await send_closing_prompt(update)
     else:
         # 1. Main Result
         msg = f"✅ **Calculation Result**\n\n"
@@ -285,15 +348,22 @@ async def display_result(update: Update, result: dict):
         # 2. Formula Snippet
         msg += f"\n`{result['formula']}`\n\n"
         
-        await update.message.reply_text(msg, parse_mode='Markdown')
-        
-        # 3. Comprehensive Explanation
-        explanation = get_detailed_explanation(result)
-        await update.message.reply_text(explanation, parse_mode='Markdown')
+        await update.effective_message.reply_text(msg, parse_mode='Markdown')
         
-    await update.message.reply_text(
+        # 3. Comprehensive Explanation is delivered in the background so the
+        # handler can end the conversation as soon as the result is out
+        context.application.create_task(send_explanation(update, result), update=update)
+
+async def send_explanation(update: Update, result: dict):
+    """Sends the detailed explanation followed by the closing prompt, in order."""
+    explanation = get_detailed_explanation(result)
+    await update.effective_message.reply_text(explanation, parse_mode='Markdown')
+    await send_closing_prompt(update)
+
+async def send_closing_prompt(update: Update):
+    await update.effective_message.reply_text(
         "Use /start to Calculate Another or Analyse Data",
-        reply_markup=ReplyKeyboardRemove()
+        reply_markup=_KB_REMOVE
     )
 
 def get_detailed_explanation(result: dict) -> str:
@@ -1,13 +1,163 @@
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
 from telegram.ext import ContextTypes, ConversationHandler, MessageHandler, filters
+from sqlalchemy.exc import IntegrityError, OperationalError
 from src.database.db_manager import DatabaseManager
 from src.utils.logger import logger
 
 from src.bot.constants import (
-    S_ID, S_NAME, S_EMAIL, S_PHONE, S_COUNTRY, S_USERNAME, S_VERIFY_CODE
+    S_ID, S_NAME, S_EMAIL, S_PHONE, S_COUNTRY, S_USERNAME, S_VERIFY_CODE,
+    HELP_TEXT
 )
 import re
-import random
+import sys
+import asyncio
+from dataclasses import dataclass
+import hashlib
+import hmac
+import secrets
+import time
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$')
+# Basic international phone regex: + followed by 7-15 digits
+PHONE_REGEX = re.compile(r'^\+[1-9]\d{1,14}$')
+
+_KB_REMOVE = ReplyKeyboardRemove()
+
+# Expanded Currency Mapping
+CURRENCY_MAP = {
+    "Nigeria": "NGN", "Ghana": "GHS", "Kenya": "KES", "South Africa": "ZAR",
+    "United Kingdom": "GBP", "UK": "GBP", "USA": "USD", "United States": "USD",
+    "Canada": "CAD", "Germany": "EUR", "France": "EUR", "Italy": "EUR", "Spain": "EUR",
+    "Great Britain": "GBP", "England": "GBP", "Scotland": "GBP", "Wales": "GBP",
+    "United States of America": "USD", "America": "USD",
+    "Ireland": "EUR", "Netherlands": "EUR", "Belgium": "EUR", "Portugal": "EUR", "Austria": "EUR"
+}
+# Interned so every user's local_currency shares one "USD"/"EUR"/... object
+_COUNTRY_TO_CCY = {sys.intern(k.lower()): sys.intern(v) for k, v in CURRENCY_MAP.items()}
+
+# List of supported/valid countries (can be expanded)
+VALID_COUNTRIES = frozenset([
+    "Nigeria", "Ghana", "Kenya", "South Africa", "United Kingdom", "UK",
+    "USA", "United States", "Canada", "Germany", "France", "Italy", "Spain",
+    "China", "India", "Australia", "Brazil", "Egypt", "Ethiopia", "Uganda"
+])
+_VALID_LC = frozenset(c.lower() for c in VALID_COUNTRIES)
+_VALID_RE = re.compile('|'.join(map(re.escape, sorted(_VALID_LC, key=len, reverse=True))))
+
+# One button per supported pricing country; callback data carries the CURRENCY_MAP key
+_PICKER_COUNTRIES = [
+    "Nigeria", "Ghana", "Kenya", "South Africa", "United Kingdom", "United States",
+    "Canada", "Germany", "France", "Italy", "Spain", "Ireland",
+    "Netherlands", "Belgium", "Portugal", "Austria"
+]
+_COUNTRY_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton(name, callback_data=f"country:{name}") for name in _PICKER_COUNTRIES[i:i + 2]]
+    for i in range(0, len(_PICKER_COUNTRIES), 2)
+])
+# Longest names first so "United Kingdom" wins over shorter overlapping aliases
+_COUNTRY_RE = re.compile(
+    '|'.join(sorted(map(re.escape, _COUNTRY_TO_CCY), key=len, reverse=True)),
+    re.IGNORECASE
+)
+
+_DIGITS = b'0123456789'
+
+def _clean(text: str) -> str:
+    """strip() that skips the copy when the text has no surrounding whitespace."""
+    return text if not text or not (text[0].isspace() or text[-1].isspace()) else text.strip()
+
+def _hash_code(code: str) -> str:
+    """Digest of a verification code, so the plaintext is never kept in user_data."""
+    return hashlib.blake2s(code.encode(), digest_size=8).hexdigest()
+
+@dataclass(slots=True)
+class SignupState:
+    """In-flight registration, stored under context.user_data['reg']."""
+    id: str = ""
+    username: str = ""
+    full_name: str = ""
+    email: str = ""
+    phone: str = ""
+
+    def user_fields(self) -> dict:
+        """Profile fields as create_user keyword arguments."""
+        return {
+            'username': self.username,
+            'full_name': self.full_name,
+            'email': self.email,
+            'phone': self.phone
+        }
+
+def _signup_state(context: ContextTypes.DEFAULT_TYPE) -> SignupState:
+    state = context.user_data.get('reg')
+    if not isinstance(state, SignupState):
+        state = context.user_data['reg'] = SignupState()
+    return state
+
+# Per-user token buckets guarding the guessable verification step: user_id -> (tokens, last_refill)
+_BUCKETS: dict = {}
+
+def _allow(user_id: int, rate: float = 5 / 60, burst: int = 5) -> bool:
+    """Token bucket: refills `rate` tokens per second up to `burst`; returns False when empty."""
+    now = time.monotonic()
+    tokens, last = _BUCKETS.get(user_id, (burst, now))
+    tokens = min(burst, tokens + (now - last) * rate)
+    if tokens < 1:
+        _BUCKETS[user_id] = (tokens, now)
+        return False
+    _BUCKETS[user_id] = (tokens - 1, now)
+    return True
+
+# Pending verification code hashes, kept out of user_data so they are never pickled: user_id -> (hash, expires_at)
+_VERIFY_CODES: dict = {}
+VERIFY_CODE_TTL = 300
+
+def _store_code(user_id: int, code_hash: str, ttl: float = VERIFY_CODE_TTL):
+    now = time.monotonic()
+    for uid in [uid for uid, (_, expires) in _VERIFY_CODES.items() if expires <= now]:
+        del _VERIFY_CODES[uid]
+    _VERIFY_CODES[user_id] = (code_hash, now + ttl)
+
+def _stored_code(user_id: int) -> str:
+    """Returns the pending code hash, or '' once it has expired."""
+    code_hash, expires = _VERIFY_CODES.get(user_id, ("", 0.0))
+    return code_hash if expires > time.monotonic() else ""
+
+# Completed signups waiting to be persisted: (chat_id, create_user kwargs)
+_write_queue: asyncio.Queue = asyncio.Queue()
+# Telegram IDs with a queued signup not yet written: telegram_id -> Event set by the writer when done
+_PENDING_SIGNUPS: dict = {}
+_writer_task = None
+
+def _build_country_automaton():
+    """Builds a trie matcher over all country aliases when pyahocorasick is installed."""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for alias, currency in _COUNTRY_TO_CCY.items():
+        automaton.add_word(alias, (alias, currency))
+    automaton.make_automaton()
+    return automaton
+
+_COUNTRY_AUTOMATON = _build_country_automaton()
+
+_DEFAULT_CCY = sys.intern("USD")
+
+def lookup_currency(country: str) -> str:
+    """Returns the currency of the most specific (longest) country name in the text, USD if none."""
+    if _COUNTRY_AUTOMATON is not None:
+        matches = [value for _, value in _COUNTRY_AUTOMATON.iter(country.lower())]
+    else:
+        matches = [(m.group(0).lower(), _COUNTRY_TO_CCY[m.group(0).lower()]) for m in _COUNTRY_RE.finditer(country)]
+    if not matches:
+        return _DEFAULT_CCY
+    return max(matches, key=lambda match: len(match[0]))[1]
 
 class SignupManager:
     """
@@ -24,20 +174,26 @@ class SignupManager:
             "1. Go to your Settings > Profile\n"
             "2. Or forward a message to @userinfobot",
             parse_mode='Markdown',
-            reply_markup=ReplyKeyboardRemove()
+            reply_markup=_KB_REMOVE
         )
         return S_ID
 
     @staticmethod
     async def handle_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_input = update.message.text.strip()
+        if not _allow(update.effective_user.id):
+            await update.message.reply_text("⏳ Too many attempts. Please wait a minute and try again.")
+            return S_ID
+
+        user_input = _clean(update.message.text)
         actual_id = update.effective_user.id
         
-        if not user_input.isdigit():
+        id_bytes = user_input.encode('ascii', 'ignore')
+        if not id_bytes or len(id_bytes) != len(user_input) or id_bytes.translate(None, _DIGITS):
              await update.message.reply_text("⚠️ Invalid ID. Please enter numeric digits only.")
              return S_ID
+        parsed_id = int(id_bytes)
 
-        if str(user_input) != str(actual_id):
+        if parsed_id != actual_id:
             await update.message.reply_text(
                 f"⚠️ The ID you entered ({user_input}) does not match your current account ID ({actual_id}).\n"
                 "Please enter your **actual Telegram ID** to proceed.",
@@ -46,28 +202,49 @@ class SignupManager:
             return S_ID
 
         # Generate 4-digit verification code
-        verify_code = str(random.randint(1000, 9999))
-        context.user_data['reg_id'] = user_input
-        context.user_data['verify_code'] = verify_code
+        verify_code = f"{secrets.randbelow(10000):04d}"
+        context.user_data['reg'] = SignupState(id=user_input)
+        _store_code(actual_id, _hash_code(verify_code))
         
-        # Send code to user
+        # Send code to user's private chat, never into the (possibly group) signup chat
+        try:
+            await context.bot.send_message(actual_id, f"🔐 Your QuantiProBot verification code is: {verify_code}")
+        except TelegramError as send_error:
+            # No private chat yet (signup from a group) or the bot is blocked
+            logger.warning(f"Could not send verification code to {actual_id}: {send_error}")
+            _VERIFY_CODES.pop(actual_id, None)
+            await update.message.reply_text(
+                "⚠️ I couldn't send you a private message.\n\n"
+                "Please open a private chat with me, send /start there, then enter your **Telegram ID** again:",
+                parse_mode='Markdown'
+            )
+            return S_ID
         await update.message.reply_text(
             f"🔐 **Verification Code Sent!**\n\n"
             f"I have sent a 4-digit code to your Telegram ID ({user_input}).\n"
-            f"**Please enter the code here to verify your account:**\n\n"
-            f"_(Debug: Use {verify_code} for now)_",
+            f"**Please enter the code here to verify your account:**",
             parse_mode='Markdown'
         )
+        # Open a DB connection while the user types, so create_user later skips connection setup
+        context.application.create_task(asyncio.to_thread(DatabaseManager().prewarm), update=update)
         return S_VERIFY_CODE
 
     @staticmethod
     async def handle_verify_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        user_code = update.message.text.strip()
-        actual_code = context.user_data.get('verify_code')
+        if not _allow(update.effective_user.id):
+            await update.message.reply_text("⏳ Too many attempts. Please wait a minute and try again.")
+            return S_VERIFY_CODE
+
+        user_code = _clean(update.message.text)
+        expected_hash = _stored_code(update.effective_user.id)
+        if not expected_hash:
+            await update.message.reply_text("⌛ Your verification code has expired. Please enter your **Telegram ID** again:", parse_mode='Markdown')
+            return S_ID
         
-        if user_code != actual_code:
+        if not hmac.compare_digest(_hash_code(user_code), expected_hash):
             await update.message.reply_text("❌ Incorrect verification code. Please try again:")
             return S_VERIFY_CODE
+        _VERIFY_CODES.pop(update.effective_user.id, None)
             
         await update.message.reply_text(
             "✅ **ID Verified!**\n\n"
@@ -78,102 +255,153 @@ class SignupManager:
         
     @staticmethod
     async def handle_username(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        username = update.message.text.strip()
+        username = _clean(update.message.text)
         if not username.startswith('@') or len(username) < 3:
             await update.message.reply_text("⚠️ A valid Telegram Username is **required** and must start with '@' (e.g., @john_doe).\n\nPlease enter your username to proceed:")
             return S_USERNAME
             
-        context.user_data['reg_username'] = username
+        _signup_state(context).username = username
         await update.message.reply_text("Got it. Now, what is your **Full Name**?")
         return S_NAME
 
     @staticmethod
     async def handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        context.user_data['reg_name'] = update.message.text
+        _signup_state(context).full_name = update.message.text
         await update.message.reply_text("Understood. Please provide your **Email Address**:")
         return S_EMAIL
 
     @staticmethod
     async def handle_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        email = update.message.text.strip()
-        EMAIL_REGEX = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
+        email = _clean(update.message.text)
         
-        if not re.match(EMAIL_REGEX, email):
+        if not EMAIL_REGEX.match(email):
             await update.message.reply_text("⚠️ Invalid email format. Please enter a valid email address (e.g., name@example.com):")
             return S_EMAIL
 
-        context.user_data['reg_email'] = email
+        _signup_state(context).email = email
         await update.message.reply_text("Thank you. What is your **Phone Number** (including country code)?\n_(e.g., +2348012345678)_")
         return S_PHONE
 
     @staticmethod
     async def handle_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        phone = update.message.text.strip()
-        # Basic international phone regex: + followed by 7-15 digits
-        PHONE_REGEX = r'^\+[1-9]\d{1,14}$'
+        phone = _clean(update.message.text)
         
-        if not re.match(PHONE_REGEX, phone):
+        if not PHONE_REGEX.match(phone):
             await update.message.reply_text("⚠️ Invalid phone format. Please use international format starting with + (e.g., +2348012345678):")
             return S_PHONE
             
-        context.user_data['reg_phone'] = phone
-        await update.message.reply_text("Finally, which **Country** are you in?")
+        _signup_state(context).phone = phone
+        await update.message.reply_text(
+            "Finally, which **Country** are you in?\n"
+            "_Tap it below, or type it if it is not listed._",
+            parse_mode='Markdown',
+            reply_markup=_COUNTRY_KB
+        )
         return S_COUNTRY
 
     @staticmethod
     async def handle_country(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        country = update.message.text.strip()
-        user_id = update.message.from_user.id
+        user_id = update.effective_user.id
+        query = update.callback_query
+        if query:
+            # Picker button: the currency is a direct lookup, no validation or matching needed
+            await query.answer()
+            country = query.data.split(':', 1)[1]
+            currency = _COUNTRY_TO_CCY.get(country.lower(), _DEFAULT_CCY)
+        else:
+            country = _clean(update.message.text)
+
+            country_lc = country.lower()
+            is_valid = country_lc in _VALID_LC or bool(_VALID_RE.search(country_lc))
+            if not is_valid and len(country) < 3:
+                 await update.message.reply_text("⚠️ Please provide a clear country name (e.g., Nigeria, USA):")
+                 return S_COUNTRY
+
+            # Try to find a match, default to USD if not found but still allow signup
+            currency = lookup_currency(country)
         
-        # List of supported/valid countries (can be expanded)
-        VALID_COUNTRIES = [
-            "Nigeria", "Ghana", "Kenya", "South Africa", "United Kingdom", "UK", 
-            "USA", "United States", "Canada", "Germany", "France", "Italy", "Spain",
-            "China", "India", "Australia", "Brazil", "Egypt", "Ethiopia", "Uganda"
-        ]
+        # Persisted by the background writer; a slow DB no longer stalls other chats
+        reg = _signup_state(context)
+        _PENDING_SIGNUPS[user_id] = asyncio.Event()
+        await _write_queue.put((update.effective_chat.id, dict(
+            telegram_id=user_id,
+            country=country,
+            local_currency=currency,
+            **reg.user_fields()
+        )))
         
-        is_valid = any(c.lower() in country.lower() for c in VALID_COUNTRIES)
-        if not is_valid and len(country) < 3:
-             await update.message.reply_text("⚠️ Please provide a clear country name (e.g., Nigeria, USA):")
-             return S_COUNTRY
+        # Welcome and user guide in one message: one API call instead of a follow-up /help
+        await update.effective_message.reply_text(
+            f"✅ **Registration Complete!**\n\n"
+            f"Welcome, {reg.full_name}. You are on the **Free Plan**.\n"
+            f"Local Pricing set to: **{currency}**\n\n"
+            f"{HELP_TEXT}",
+            parse_mode='Markdown'
+        )
+        return ConversationHandler.END
 
+    @staticmethod
+    async def user_writer(bot):
+        """Drains the signup queue, creating users off the update path and reporting failures."""
         db = DatabaseManager()
-        
-        # Expanded Currency Mapping
-        currency_map = {
-            "Nigeria": "NGN", "Ghana": "GHS", "Kenya": "KES", "South Africa": "ZAR",
-            "United Kingdom": "GBP", "UK": "GBP", "USA": "USD", "United States": "USD",
-            "Canada": "CAD", "Germany": "EUR", "France": "EUR", "Italy": "EUR", "Spain": "EUR"
-        }
-        
-        # Try to find a match, default to USD if not found but still allow signup
-        currency = "USD"
-        for k, v in currency_map.items():
-            if k.lower() in country.lower():
-                currency = v
-                break
-        
+        while True:
+            chat_id, row = await _write_queue.get()
+            try:
+                await asyncio.to_thread(db.create_user, **row)
+            except IntegrityError:
+                logger.warning(f"Signup for {row['telegram_id']} hit an existing account")
+                await SignupManager._notify(bot, chat_id, "ℹ️ An account already exists for this Telegram ID. Send /start to continue.")
+            except OperationalError as e:
+                logger.error(f"Signup failed for {row['telegram_id']}: {e}")
+                await SignupManager._notify(bot, chat_id, "❌ Registration Error: the database is temporarily unavailable.\n\nPlease try again with /start in a moment.")
+            except Exception:
+                # The writer serves every chat, so an unexpected error must not end the loop
+                logger.exception(f"Unexpected signup failure for {row['telegram_id']}")
+                await SignupManager._notify(bot, chat_id, "❌ Registration Error.\n\nPlease try again with /start or contact support.")
+            finally:
+                done = _PENDING_SIGNUPS.pop(row['telegram_id'], None)
+                if done is not None:
+                    done.set()
+                _write_queue.task_done()
+
+    @staticmethod
+    async def wait_for_signup(user_id: int, timeout: float = 10.0) -> bool:
+        """
+        Waits (bounded) for a queued signup of user_id to reach the database, so a /start
+        sent right after registering finds the user. Returns True if it is still pending.
+        """
+        done = _PENDING_SIGNUPS.get(user_id)
+        if done is None:
+            return False
         try:
-            db.create_user(
-                telegram_id=user_id,
-                full_name=context.user_data['reg_name'],
-                username=context.user_data['reg_username'],
-                email=context.user_data['reg_email'],
-                phone=context.user_data['reg_phone'],
-                country=country,
-                local_currency=currency
-            )
-            
-            await update.message.reply_text(
-                f"✅ **Registration Complete!**\n\n"
-                f"Welcome, {context.user_data['reg_name']}. You are on the **Free Plan**.\n"
-                f"Local Pricing set to: **{currency}**\n\n"
-                f"Use /help to see what I can do or send /start to begin your analysis.",
-                parse_mode='Markdown'
-            )
-            return ConversationHandler.END
-            
-        except Exception as e:
-            logger.error(f"Signup failed for {user_id}: {e}")
-            await update.message.reply_text(f"❌ Registration Error: {str(e)}\n\nPlease try again with /start or contact support.")
-            return ConversationHandler.END
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return user_id in _PENDING_SIGNUPS
+
+    @staticmethod
+    async def _notify(bot, chat_id: int, text: str):
+        try:
+            await bot.send_message(chat_id, text)
+        except TelegramError as send_error:
+            logger.error(f"Could not notify {chat_id} of signup failure: {send_error}")
+
+    @staticmethod
+    def start_user_writer(bot):
+        """Starts the single background signup writer (call once the event loop is running)."""
+        global _writer_task
+        if _writer_task is None:
+            _writer_task = asyncio.create_task(SignupManager.user_writer(bot))
+
+    @staticmethod
+    async def stop_user_writer(timeout: float = 10.0):
+        """Flushes pending signups (bounded by timeout) and stops the writer."""
+        global _writer_task
+        if _writer_task is None:
+            return
+        try:
+            await asyncio.wait_for(_write_queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Signup writer stopped with {_write_queue.qsize()} pending users")
+        _writer_task.cancel()
+        _writer_task = None
@@ -1,10 +1,184 @@
 import os
 import re
+import asyncio
+import orjson
+import reprlib
+import time
+import hashlib
 import logging
-from typing import Dict, Any
+import httpx
+from collections import OrderedDict
+import openai
+from openai import AsyncOpenAI
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Markdown stripping for _clean_formatting, compiled once:
+# **bold**, *italic*, __bold__ and _italic_ in a single alternation
+_RE_MD = re.compile(r'\*\*([^*]+)\*\*|\*([^*]+)\*|__([^_]+)__|_([^_]+)_')
+_RE_NL = re.compile(r'\n{3,}')
+
+def _unwrap(match: re.Match) -> str:
+    return match.group(1) or match.group(2) or match.group(3) or match.group(4)
+
+# Headline statistics kept when an oversized result dict has to be cut down for a prompt
+_KEY_STATS = (
+    'p_val', 'p-val', 't_val', 'r', 'r_squared', 'adj_r_squared', 'f_pvalue',
+    'chi2', 'dof', 'alpha', 'n', 'n_observations', 'interpretation'
+)
+
+class _PromptRepr(reprlib.Repr):
+    """reprlib limits plus plain formatting for numpy scalars (0.01, not np.float64(0.01))."""
+
+    def __init__(self):
+        super().__init__()
+        self.maxlevel = 4
+        self.maxdict = 12
+        self.maxlist = self.maxtuple = self.maxset = 12
+        self.maxstring = 120
+        self.maxother = 200
+
+    def _plain(self, x, level):
+        return str(x)
+
+    repr_float64 = repr_float32 = repr_int64 = repr_int32 = repr_bool_ = _plain
+
+_SHORT = _PromptRepr()
+
+def _bounded_repr(obj: Any, limit: int) -> str:
+    """
+    Repr of obj capped at limit chars, built with per-level element limits so a
+    large matrix is never fully stringified. Oversized dicts are reduced to their
+    headline statistics first.
+    """
+    text = _SHORT.repr(obj)
+    if isinstance(obj, dict) and (len(text) > limit or '...' in text):
+        key_stats = {k: obj[k] for k in _KEY_STATS if k in obj}
+        if key_stats:
+            text = _SHORT.repr(key_stats)
+    return text[:limit]
+
+# Fixed system prompts: identical on every call so OpenAI can reuse the cached prefix;
+# anything per-user or per-study goes in the user message.
+_CHAT_SYSTEM = (
+    "You are an expert statistical consultant assisting a researcher. "
+    "The context of their recent analysis is provided with their message.\n"
+    "When asked to 'explain this' or interpret a result, refer specifically to the data provided in the context.\n"
+    "IMPORTANT: If the user asks to 'discuss the results' or similar, look for the MOST RECENT entry in the 'RECENT ANALYSIS RESULTS' section and provide a detailed scientific interpretation of those specific findings.\n"
+    "If the user asks about a histogram, look for the 'Underlying Data/Stats' to describe the distribution (mean, standard deviation, skewness based on mean/median comparison).\n"
+    "If the user asks about a radar chart, look for the 'means' in the stats to see which variables have high or low values relative to others.\n"
+    "If the user asks about a scatter plot, use the 'correlation' value to describe the strength and direction of the relationship.\n"
+    "Use professional but accessible language. "
+    "Do NOT use markdown bold/italic (**text**) in your final output, use plain text only."
+)
+
+_DISCUSSION_SYSTEM = """You are Dr. Sarah Chen, a senior academic writing consultant with 20+ years experience in research methodology.
+Write detailed, comprehensive academic content in formal, clear academic prose without any markdown formatting.
+Your output MUST meet the word count requirement given in the request.
+
+Write comprehensive manuscript content that includes:
+1. INTRODUCTION - Background and rationale (2-3 paragraphs)
+2. KEY FINDINGS - Summary of results (2-3 paragraphs)
+3. INTERPRETATION - Explain each analysis result in context of research questions. 
+   ENRICH with clear, technical but easy-to-understand narratives for each finding.
+4. HYPOTHESIS TESTING - State whether hypotheses were SUPPORTED or NOT SUPPORTED with evidence
+5. IMPLICATIONS - Practical and theoretical implications (1-2 paragraphs)
+6. LIMITATIONS - Acknowledge study limitations (1 paragraph)
+7. FUTURE RESEARCH - Suggest directions for future research (1 paragraph)
+8. CONCLUSION - Summary of key takeaways (1 paragraph)
+
+STYLE REQUIREMENT:
+- Use formal academic prose
+- Avoid buzzwords; focus on data-driven clarity
+
+IMPORTANT FORMATTING:
+- Use clear paragraph structure
+- Do NOT use markdown, asterisks, or bullet points
+- Start directly with the content (no headers or section labels)"""
+
+_JSON_ONLY_SYSTEM = "You are a research assistant. Respond with JSON only."
+# Code fences around a JSON reply, in case a model ignores JSON mode
+_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+def _load_json_reply(content: str) -> Any:
+    return orjson.loads(_FENCE_RE.sub('', content.strip()))
+
+# Prompt budget for generate_discussion: per analysis, and for all analyses together
+_MAX_ANALYSIS_CHARS = 800
+_MAX_ANALYSES_SUMMARY = 6000
+
+# AsyncOpenAI clients by API key; AIInterpreter is created per request, the client is not
+_CLIENTS: Dict[str, Any] = {}
+# Caps in-flight OpenAI requests across all chats; latency tails blow up past a handful
+_OPENAI_SEM = asyncio.Semaphore(int(os.getenv('OPENAI_MAX_CONCURRENCY', '8')))
+# Total time an interpretation may take across all retries before the template is used
+_INTERPRET_DEADLINE = 30.0
+# Retries for a discussion; each attempt may run 90s, so the client's 3 would hold a user ~6 minutes
+_DISCUSSION_RETRIES = 1
+# Seconds between on_progress callbacks while streaming (Telegram throttles message edits)
+_PROGRESS_INTERVAL = 3.0
+
+# Recent interpret_results outputs: (analysis_type, results digest) -> (inserted_at, text), oldest first
+_INTERPRET_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
+_CACHE_MAX = 256
+_CACHE_TTL = 900
+_ORJSON_CANONICAL = orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _cache_key(analysis_type: str, results: Dict[str, Any]) -> Optional[tuple]:
+    try:
+        canonical = orjson.dumps(results, default=str, option=_ORJSON_CANONICAL)
+    except TypeError:
+        return None  # unserializable payload; just skip caching
+    return (analysis_type, hashlib.blake2b(canonical, digest_size=16).hexdigest())
+
+def _cache_get(key: tuple) -> Optional[str]:
+    hit = _INTERPRET_CACHE.get(key)
+    if hit is None:
+        return None
+    inserted_at, text = hit
+    if time.monotonic() - inserted_at > _CACHE_TTL:
+        del _INTERPRET_CACHE[key]
+        return None
+    _INTERPRET_CACHE.move_to_end(key)
+    return text
+
+def _cache_put(key: tuple, text: str):
+    _INTERPRET_CACHE[key] = (time.monotonic(), text)
+    _INTERPRET_CACHE.move_to_end(key)
+    while len(_INTERPRET_CACHE) > _CACHE_MAX:
+        _INTERPRET_CACHE.popitem(last=False)
+
+def _sig(p: float) -> str:
+    return "significant" if p < 0.05 else "not significant"
+
+# Header of every interpretation, and the fallbacks that never vary, built once
+_PREFIX = "📊 Interpretation:\n\n"
+_DESCRIPTIVE_FALLBACK = _PREFIX + (
+    "The descriptive statistics show the central tendency (mean, median) "
+    "and dispersion (std, min, max) of your numeric variables. Look for outliers or unexpected values."
+)
+_CORRELATION_FALLBACK = _PREFIX + (
+    "The correlation matrix shows relationships between variables. "
+    "Values close to +1 or -1 indicate strong relationships, while values near 0 suggest weak or no linear relationship."
+)
+
+# _template_fallback sentences for tests summarised by their p-value alone
+_P_TEMPLATES = {
+    'ttest': "The T-test result was statistically {sig} (p={p:.4f}). This suggests that the difference between the groups is {sig}.",
+    'chi2': "The Chi-square test was statistically {sig} (p={p:.4f}).",
+    'mwu': "The Mann-Whitney U test results indicate a {sig} difference between the groups (p={p:.4f}).",
+    'anova': "The ANOVA results show a {sig} difference between the group means (p={p:.4f}).",
+}
+
+# One-sentence findings for _discussion_fallback, keyed by the 'test' label stored in analysis_history
+_FINDING_FORMATTERS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    'T-Test': lambda d: f"The T-test results were statistically {_sig(d.get('p_val', 1.0))} (p={d.get('p_val', 1.0):.4f}).",
+    'Regression': lambda d: f"The regression model explained {d.get('r_squared', 0):.1%} of variance in the outcome.",
+    'Correlation': lambda d: f"A correlation of r={d.get('r', 0):.3f} was observed between the variables.",
+    'Chi-Square': lambda d: f"The Chi-square test was statistically {_sig(d.get('p_val', 1.0))} (p={d.get('p_val', 1.0):.4f}).",
+}
+
 class AIInterpreter:
     """
     AI-Powered Statistical Interpreter.
@@ -17,16 +191,63 @@ class AIInterpreter:
         if not self.api_key:
             logger.warning("OPENAI_API_KEY not found. AI interpretation will use templates.")
 
+    def _get_client(self):
+        """Shared AsyncOpenAI client, so every call reuses one warm HTTP connection pool."""
+        client = _CLIENTS.get(self.api_key)
+        if client is None:
+            client = _CLIENTS[self.api_key] = AsyncOpenAI(
+                api_key=self.api_key,
+                max_retries=3,
+                # Short per-attempt reads so a stalled request is retried rather than waited out
+                timeout=httpx.Timeout(connect=5.0, read=20.0, write=10.0, pool=5.0)
+            )
+        return client
+
+    def _client_with(self, max_retries: Optional[int] = None):
+        """The shared client, or a view of it with its own retry count."""
+        client = self._get_client()
+        return client if max_retries is None else client.with_options(max_retries=max_retries)
+
+    async def _complete(self, max_retries: Optional[int] = None, **kwargs):
+        """chat.completions.create on the shared client, bounded by the process-wide concurrency limit."""
+        async with _OPENAI_SEM:
+            return await self._client_with(max_retries).chat.completions.create(**kwargs)
+
+    async def _complete_streamed(self, on_progress: Callable[[int], Awaitable[Any]],
+                                 max_retries: Optional[int] = None, **kwargs) -> str:
+        """Streamed _complete: returns the full text, reporting approximate word counts as it arrives."""
+        parts = []
+        words = 0
+        last_report = time.monotonic()
+        async with _OPENAI_SEM:
+            stream = await self._client_with(max_retries).chat.completions.create(stream=True, **kwargs)
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                parts.append(delta)
+                words += delta.count(' ') + delta.count('\n')
+                if time.monotonic() - last_report >= _PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    try:
+                        await on_progress(words)
+                    except Exception as e:
+                        logger.warning(f"Progress update failed: {e}")
+        return ''.join(parts)
+
     @staticmethod
     def _clean_formatting(text: str) -> str:
         """Remove asterisks and clean up formatting for Telegram."""
+        # Most replies follow the no-markdown instruction; skip the regex entirely then
+        if '*' not in text and '_' not in text:
+            return _RE_NL.sub('\n\n', text).strip()
         # Remove markdown bold/italic asterisks
-        text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)  # **bold** -> bold
-        text = re.sub(r'\*([^*]+)\*', r'\1', text)      # *italic* -> italic
-        text = re.sub(r'__([^_]+)__', r'\1', text)      # __bold__ -> bold
-        text = re.sub(r'_([^_]+)_', r'\1', text)        # _italic_ -> italic
+        # One pass per nesting level (e.g. _**x**_), usually just one
+        stripped = 1
+        while stripped:
+            text, stripped = _RE_MD.subn(_unwrap, text)
         # Clean up extra whitespace
-        text = re.sub(r'\n{3,}', '\n\n', text)
+        text = _RE_NL.sub('\n\n', text)
         return text.strip()
 
     async def interpret_results(self, analysis_type: str, results: Dict[str, Any]) -> str:
@@ -34,33 +255,40 @@ class AIInterpreter:
         Generate a plain-language explanation of the results.
         """
         if self.api_key:
+            key = _cache_key(analysis_type, results)
+            cached = _cache_get(key) if key else None
+            if cached is not None:
+                return cached
             try:
-                from openai import AsyncOpenAI
-                client = AsyncOpenAI(api_key=self.api_key)
-                
                 prompt = (
                     f"You are a PhD statistician for 'QuantiProBot'. Explain the following {analysis_type} results "
                     f"in plain, professional language suitable for a research manuscript results section.\n\n"
-                    f"Results JSON: {str(results)}\n\n"
+                    f"Results: {_bounded_repr(results, 1500)}\n\n"
                     "IMPORTANT: Do NOT use markdown formatting like asterisks or underscores. "
                     "Write in plain text only. Focus on whether the result is significant, "
                     "the effect size, and a brief implication. Keep it under 150 words."
                 )
                 
-                response = await client.chat.completions.create(
+                # Client's short per-attempt timeouts and retries, within one overall deadline
+                response = await asyncio.wait_for(self._complete(
                     model="gpt-4o-mini",
                     messages=[
                         {"role": "system", "content": "You are a professional statistical consultant. Never use asterisks or markdown formatting in your responses."},
                         {"role": "user", "content": prompt}
                     ],
                     max_tokens=300,
-                    temperature=0.7,
-                    timeout=30.0  # 30 second timeout
-                )
+                    temperature=0.7
+                ), _INTERPRET_DEADLINE)
                 content = self._clean_formatting(response.choices[0].message.content)
-                return f"📊 Interpretation:\n\n{content}"
-            except TimeoutError:
-                logger.warning("OpenAI API timeout - using fallback")
+                interpretation = _PREFIX + content
+                if key:
+                    _cache_put(key, interpretation)
+                return interpretation
+            except openai.APIConnectionError as e:
+                logger.warning(f"OpenAI unreachable after retries ({type(e).__name__}) - using fallback")
+                return self._template_fallback(analysis_type, results)
+            except asyncio.TimeoutError:
+                logger.warning(f"OpenAI interpretation exceeded {_INTERPRET_DEADLINE:.0f}s - using fallback")
                 return self._template_fallback(analysis_type, results)
             except Exception as e:
                 logger.error(f"OpenAI error: {e}")
@@ -68,7 +296,30 @@ class AIInterpreter:
         else:
             return self._template_fallback(analysis_type, results)
 
-
+    async def interpret_results_batch(self, items: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """
+        Interpret several (analysis_type, results) pairs concurrently.
+        Identical pairs share a single request; the output order matches the input.
+        """
+        slots: Dict[Any, int] = {}
+        unique: List[Tuple[str, Dict[str, Any]]] = []
+        positions = []
+        for i, (analysis_type, results) in enumerate(items):
+            key = _cache_key(analysis_type, results) or i
+            if key not in slots:
+                slots[key] = len(unique)
+                unique.append((analysis_type, results))
+            positions.append(slots[key])
+
+        outputs = await asyncio.gather(
+            *(self.interpret_results(t, r) for t, r in unique),
+            return_exceptions=True
+        )
+        outputs = [
+            self._template_fallback(t, r) if isinstance(out, Exception) else out
+            for (t, r), out in zip(unique, outputs)
+        ]
+        return [outputs[pos] for pos in positions]
 
     async def chat(self, user_msg: str, file_path: str = None, analysis_history: list = None, visuals_history: list = None) -> str:
         """
@@ -78,56 +329,45 @@ class AIInterpreter:
             return "⚠️ AI features are not enabled (API Key missing). I can only run statistical tests."
 
         try:
-            from openai import AsyncOpenAI
-            client = AsyncOpenAI(api_key=self.api_key)
-            
             # 1. Build Context String
-            context_text = ""
+            parts = []
             
             # Recent Analysis (last 5 for better conversational context)
             if analysis_history:
-                context_text += "\n\nRECENT ANALYSIS RESULTS:\n"
+                parts.append("\n\nRECENT ANALYSIS RESULTS:\n")
                 for i, item in enumerate(analysis_history[-5:], 1):
                     test = item.get('test', 'Analysis')
                     vars = item.get('vars', 'N/A')
                     # Include both raw data and the plain language summary
-                    data_str = str(item.get('data'))[:400]
+                    data_str = _bounded_repr(item.get('data'), 400)
                     narrative = item.get('result', 'No interpretation recorded.')
-                    context_text += f"{i}. {test} on {vars}:\n   Result: {narrative}\n   Raw Data: {data_str}\n"
+                    parts.append(f"{i}. {test} on {vars}:\n   Result: {narrative}\n   Raw Data: {data_str}\n")
             
             # Recent Visuals (last 3)
             if visuals_history:
-                context_text += "\n\nRECENT CHARTS GENERATED:\n"
+                parts.append("\n\nRECENT CHARTS GENERATED:\n")
                 for i, item in enumerate(visuals_history[-3:], 1):
                     # SAFETY CHECK: If someone appended a string path instead of a dict
                     if isinstance(item, str):
-                        context_text += f"{i}. Chart: {os.path.basename(item)}\n"
+                        parts.append(f"{i}. Chart: {os.path.basename(item)}\n")
                         continue
                         
                     # item keys: path, title, type, data
-                    chart_info = f"{i}. {item.get('title', 'Chart')} ({item.get('type', 'unknown')})\n"
+                    parts.append(f"{i}. {item.get('title', 'Chart')} ({item.get('type', 'unknown')})\n")
                     if item.get('data'):
                          # Include descriptive stats captured for the chart
-                         chart_info += f"   Underlying Data/Stats: {str(item.get('data'))[:600]}\n"
-                    context_text += chart_info
-
-            system_prompt = (
-                "You are an expert statistical consultant assisting a researcher. "
-                "You have access to the context of their recent analysis below.\n"
-                "When asked to 'explain this' or interpret a result, refer specifically to the data provided in the context.\n"
-                "IMPORTANT: If the user asks to 'discuss the results' or similar, look for the MOST RECENT entry in the 'RECENT ANALYSIS RESULTS' section and provide a detailed scientific interpretation of those specific findings.\n"
-                "If the user asks about a histogram, look for the 'Underlying Data/Stats' to describe the distribution (mean, standard deviation, skewness based on mean/median comparison).\n"
-                "If the user asks about a radar chart, look for the 'means' in the stats to see which variables have high or low values relative to others.\n"
-                "If the user asks about a scatter plot, use the 'correlation' value to describe the strength and direction of the relationship.\n"
-                "Use professional but accessible language. "
-                "Do NOT use markdown bold/italic (**text**) in your final output, use plain text only."
-                f"{context_text}"
-            )
+                         parts.append(f"   Underlying Data/Stats: {_bounded_repr(item.get('data'), 600)}\n")
+
+            context_text = ''.join(parts)
 
-            response = await client.chat.completions.create(
+            # Context goes in the user turn so the system prompt stays a fixed, cacheable prefix
+            if context_text:
+                user_msg = f"CONTEXT:{context_text}\n\nQUESTION: {user_msg}"
+
+            response = await self._complete(
                 model="gpt-4o-mini",
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": _CHAT_SYSTEM},
                     {"role": "user", "content": user_msg}
                 ],
                 max_tokens=400,
@@ -136,6 +376,9 @@ class AIInterpreter:
             
             return self._clean_formatting(response.choices[0].message.content)
 
+        except openai.APIConnectionError as e:
+            logger.warning(f"Chat: OpenAI unreachable after retries ({type(e).__name__})")
+            return "⏳ The AI service is not responding right now. Please try again in a moment."
         except Exception as e:
             logger.error(f"Chat error: {e}")
             return "I encountered an error trying to process your request."
@@ -151,10 +394,6 @@ class AIInterpreter:
             }
 
         try:
-            from openai import AsyncOpenAI
-            import json
-            client = AsyncOpenAI(api_key=self.api_key)
-            
             prompt = f"""
             You are a senior research consultant. Based on the following research topic/title, suggest 3 research questions and 3 corresponding hypotheses.
             Topic: {topic}
@@ -164,20 +403,18 @@ class AIInterpreter:
             Example: {{"questions": ["Q1", "Q2"], "hypotheses": ["H1", "H2"]}}
             """
 
-            response = await client.chat.completions.create(
+            response = await self._complete(
                 model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
+                messages=[
+                    {"role": "system", "content": _JSON_ONLY_SYSTEM},
+                    {"role": "user", "content": prompt}
+                ],
                 max_tokens=600,
-                temperature=0.7
+                temperature=0.7,
+                response_format={"type": "json_object"}
             )
             
-            content = response.choices[0].message.content.strip()
-            if content.startswith("```json"):
-                content = content[7:-3]
-            elif content.startswith("```"):
-                content = content[3:-3]
-                
-            data = json.loads(content)
+            data = _load_json_reply(response.choices[0].message.content)
             # Ensure they are lists
             if isinstance(data.get('questions'), str):
                 data['questions'] = [line.strip() for line in data['questions'].split('\n') if line.strip()]
@@ -195,44 +432,20 @@ class AIInterpreter:
 
     def _template_fallback(self, analysis_type: str, results: Dict[str, Any]) -> str:
         """Simple templates for when no AI is available."""
+        template = _P_TEMPLATES.get(analysis_type)
+        if template:
+            p = results.get('p-val', results.get('p_val', 1.0))
+            return _PREFIX + template.format(sig=_sig(p), p=p)
         if analysis_type == "descriptive":
-            return (
-                "📊 Interpretation:\n\n"
-                "The descriptive statistics show the central tendency (mean, median) "
-                "and dispersion (std, min, max) of your numeric variables. Look for outliers or unexpected values."
-            )
-        elif analysis_type == "ttest":
-            p = results.get('p_val', 1.0)
-            sig = "significant" if p < 0.05 else "not significant"
-            return (
-                f"📊 Interpretation:\n\n"
-                f"The T-test result was statistically {sig} (p={p:.4f}). "
-                f"This suggests that the difference between the groups is {sig}."
-            )
+            return _DESCRIPTIVE_FALLBACK
         elif analysis_type == "correlation":
-            return (
-                "📊 Interpretation:\n\n"
-                "The correlation matrix shows relationships between variables. "
-                "Values close to +1 or -1 indicate strong relationships, while values near 0 suggest weak or no linear relationship."
-            )
+            return _CORRELATION_FALLBACK
         elif analysis_type == "regression":
             r2 = results.get('r_squared', 0)
-            return f"📊 Interpretation:\n\nThe regression model explains {r2:.2%} of the variance in the outcome variable."
-        elif analysis_type == "chi2":
-            p = results.get('p_val', 1.0)
-            sig = "significant" if p < 0.05 else "not significant"
-            return f"📊 Interpretation:\n\nThe Chi-square test was statistically {sig} (p={p:.4f})."
-        elif analysis_type == "mwu":
-            p = results.get('p-val', results.get('p_val', 1.0))
-            sig = "significant" if p < 0.05 else "not significant"
-            return f"📊 Interpretation:\n\nThe Mann-Whitney U test results indicate a {sig} difference between the groups (p={p:.4f})."
-        elif analysis_type == "anova":
-            p = results.get('p_val', 1.0)
-            sig = "significant" if p < 0.05 else "not significant"
-            return f"📊 Interpretation:\n\nThe ANOVA results show a {sig} difference between the group means (p={p:.4f})."
+            return f"{_PREFIX}The regression model explains {r2:.2%} of the variance in the outcome variable."
         elif analysis_type == "reliability":
             alpha = results.get('alpha', 0)
-            return f"📊 Interpretation:\n\nCronbach's Alpha = {alpha:.3f}. Values above 0.7 are generally acceptable for reliability."
+            return f"{_PREFIX}Cronbach's Alpha = {alpha:.3f}. Values above 0.7 are generally acceptable for reliability."
         
         return "📊 Analysis complete. Review the results above."
 
@@ -243,22 +456,31 @@ class AIInterpreter:
                                   analysis_history: list, 
                                   descriptive_stats: str = "",
                                   style_hint: str = "technical but simple and academic",
+                                  on_progress: Optional[Callable[[int], Awaitable[Any]]] = None,
                                   **kwargs) -> str:
         """
         Generate a comprehensive research discussion and interpretation.
+        When on_progress is given the reply is streamed and on_progress(words_so_far)
+        is awaited every few seconds, so the caller can show that writing is under way.
         """
         if self.api_key:
             try:
-                from openai import AsyncOpenAI
-                client = AsyncOpenAI(api_key=self.api_key)
-                
                 # Consolidate analysis history for the prompt
-                analyses_summary = ""
+                parts = []
+                size = 0
                 for i, item in enumerate(analysis_history, 1):
+                    if size > _MAX_ANALYSES_SUMMARY:
+                        break  # the rest would be truncated away anyway
                     test = item.get('test', 'Analysis')
                     vars = item.get('vars', 'N/A')
-                    res = item.get('result', 'No detailed result available')
-                    analyses_summary += f"{i}. {test} on {vars}:\n   {res}\n\n"
+                    res = str(item.get('result', 'No detailed result available'))
+                    if len(res) > _MAX_ANALYSIS_CHARS:
+                        res = res[:_MAX_ANALYSIS_CHARS] + '...'
+                    parts.append(f"{i}. {test} on {vars}:\n   {res}\n\n")
+                    size += len(parts[-1])
+                analyses_summary = ''.join(parts)
+                if len(analyses_summary) > _MAX_ANALYSES_SUMMARY:
+                    analyses_summary = analyses_summary[:_MAX_ANALYSES_SUMMARY] + '\n... (truncated)'
                 
                 # Word count instruction based on target
                 min_words = kwargs.get('min_word_count', 1500)
@@ -271,8 +493,7 @@ class AIInterpreter:
                 if max_tokens > 4000:
                     max_tokens = 4000
                 
-                prompt = f"""You are Dr. Sarah Chen, a senior academic writing consultant with 20+ years experience in research methodology.
-Write a COMPREHENSIVE manuscript content for a research paper based on the following:
+                prompt = f"""Write a COMPREHENSIVE manuscript content for a research paper based on the following:
 
 RESEARCH CONTEXT:
 - Title: {title}
@@ -286,44 +507,34 @@ ANALYSIS RESULTS:
 DESCRIPTIVE STATISTICS (Summary):
 {descriptive_stats[:500] if descriptive_stats else 'Not provided'}
 
-Write comprehensive manuscript content that includes:
-1. INTRODUCTION - Background and rationale (2-3 paragraphs)
-2. KEY FINDINGS - Summary of results (2-3 paragraphs)
-3. INTERPRETATION - Explain each analysis result in context of research questions. 
-   ENRICH with clear, technical but easy-to-understand narratives for each finding.
-4. HYPOTHESIS TESTING - State whether hypotheses were SUPPORTED or NOT SUPPORTED with evidence
-5. IMPLICATIONS - Practical and theoretical implications (1-2 paragraphs)
-6. LIMITATIONS - Acknowledge study limitations (1 paragraph)
-7. FUTURE RESEARCH - Suggest directions for future research (1 paragraph)
-8. CONCLUSION - Summary of key takeaways (1 paragraph)
-
-STYLE REQUIREMENT:
-- {style_hint}
-- Use formal academic prose
-- Avoid buzzwords; focus on data-driven clarity
+STYLE: {style_hint}
 
 CRITICAL WORD COUNT REQUIREMENT:
 Your response MUST be between {min_words} and {max_words} words.
 This is a strict requirement. Write detailed, comprehensive content to meet this word count.
-Expand on each point thoroughly. Add context, examples, and detailed explanations.
-
-IMPORTANT FORMATTING:
-- Use clear paragraph structure
-- Do NOT use markdown, asterisks, or bullet points
-- Start directly with the content (no headers or section labels)"""
+Expand on each point thoroughly. Add context, examples, and detailed explanations."""
                 
-                response = await client.chat.completions.create(
+                request = dict(
                     model="gpt-4o-mini",
                     messages=[
-                        {"role": "system", "content": "You are a senior academic writing consultant. Write detailed, comprehensive academic content. Your output MUST meet the specified word count requirement. Write in formal, clear academic prose without any markdown formatting."},
+                        {"role": "system", "content": _DISCUSSION_SYSTEM},
                         {"role": "user", "content": prompt}
                     ],
                     max_tokens=max_tokens,
                     temperature=0.7,
-                    timeout=90.0  # 90s timeout for long reports
+                    timeout=90.0,  # 90s per attempt for long reports
+                    max_retries=_DISCUSSION_RETRIES
                 )
-                content = self._clean_formatting(response.choices[0].message.content)
+                if on_progress:
+                    raw = await self._complete_streamed(on_progress, **request)
+                else:
+                    response = await self._complete(**request)
+                    raw = response.choices[0].message.content
+                content = self._clean_formatting(raw)
                 return content
+            except openai.APIConnectionError as e:
+                logger.warning(f"OpenAI unreachable after retries in generate_discussion ({type(e).__name__})")
+                return self._discussion_fallback(title, analysis_history)
             except Exception as e:
                 logger.error(f"OpenAI error in generate_discussion: {e}")
                 return self._discussion_fallback(title, analysis_history)
@@ -340,36 +551,29 @@ IMPORTANT FORMATTING:
             return []
 
         try:
-            from openai import AsyncOpenAI
-            import json
-            client = AsyncOpenAI(api_key=self.api_key)
-            
             prompt = f"""
             You are an academic research assistant.
             Generate {count} REAL or highly plausible academic references relevant to this study:
             Title: {title}
             Objectives: {objectives}
             
-            Return ONLY a JSON array of objects with these keys: "authors", "year", "title", "source".
+            Return a JSON object {{"references": [...]}} whose list holds objects with these keys: "authors", "year", "title", "source".
             Ensure they are formatted for APA 7th edition citation.
-            Example: [{{"authors": "Smith, J.", "year": "2023", "title": "Study Name", "source": "Journal of X"}}]
+            Example: {{"references": [{{"authors": "Smith, J.", "year": "2023", "title": "Study Name", "source": "Journal of X"}}]}}
             """
 
-            response = await client.chat.completions.create(
+            response = await self._complete(
                 model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
+                messages=[
+                    {"role": "system", "content": _JSON_ONLY_SYSTEM},
+                    {"role": "user", "content": prompt}
+                ],
                 max_tokens=600,
-                temperature=0.7
+                temperature=0.7,
+                response_format={"type": "json_object"}
             )
             
-            content = response.choices[0].message.content.strip()
-            # Clean markdown code blocks if present
-            if content.startswith("```json"):
-                content = content[7:-3]
-            elif content.startswith("```"):
-                content = content[3:-3]
-                
-            refs = json.loads(content)
+            refs = _load_json_reply(response.choices[0].message.content).get('references', [])
             return refs
         except Exception as e:
             logger.error(f"Error generating references: {e}")
@@ -379,23 +583,9 @@ IMPORTANT FORMATTING:
         """Generate a basic discussion when AI is not available."""
         findings = []
         for analysis in analysis_history:
-            test_type = analysis.get('test', 'Unknown')
-            data = analysis.get('data', {})
-            
-            if test_type == 'T-Test':
-                p = data.get('p_val', 1.0)
-                sig = "significant" if p < 0.05 else "not significant"
-                findings.append(f"The T-test results were statistically {sig} (p={p:.4f}).")
-            elif test_type == 'Regression':
-                r2 = data.get('r_squared', 0)
-                findings.append(f"The regression model explained {r2:.1%} of variance in the outcome.")
-            elif test_type == 'Correlation':
-                r = data.get('r', 0)
-                findings.append(f"A correlation of r={r:.3f} was observed between the variables.")
-            elif test_type == 'Chi-Square':
-                p = data.get('p_val', 1.0)
-                sig = "significant" if p < 0.05 else "not significant"
-                findings.append(f"The Chi-square test was statistically {sig} (p={p:.4f}).")
+            formatter = _FINDING_FORMATTERS.get(analysis.get('test', 'Unknown'))
+            if formatter:
+                findings.append(formatter(analysis.get('data', {})))
         
         findings_text = " ".join(findings) if findings else "No specific findings to report."
         
@@ -417,18 +607,15 @@ The results contribute to the existing body of literature and offer practical re
             return "Chart generated. Ask me to interpret it for you!"
 
         try:
-            from openai import AsyncOpenAI
-            client = AsyncOpenAI(api_key=self.api_key)
-            
             prompt = (
                 f"A researcher just generated a {chart_type}. "
-                f"Here are the summary statistics/data: {str(data)[:1000]}\n"
+                f"Here are the summary statistics/data: {_bounded_repr(data, 1000)}\n"
                 "Provide a 1-sentence quick takeaway and 2 highly specific follow-up questions they could ask me.\n"
                 "Format: [Takeaway]\n\n[Question 1]\n[Question 2]\n"
                 "Keep it technical but simple. No markdown formatting."
             )
 
-            response = await client.chat.completions.create(
+            response = await self._complete(
                 model="gpt-4o-mini",
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=150,
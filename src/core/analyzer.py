@@ -3,8 +3,90 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List, Any, Union
 
-# Optional Dependencies (Lazy Loaded)
-HAS_ADVANCED_STATS = True # Assumed true if installed, checks inside methods
+# Optional Dependencies (imported once here; methods check the flags)
+try:
+    from scipy import stats
+    from scipy.stats import spearmanr, kendalltau, t as t_dist
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+try:
+    import pingouin as pg
+    HAS_PINGOUIN = True
+except ImportError:
+    HAS_PINGOUIN = False
+
+try:
+    import statsmodels.api as sm
+    HAS_STATSMODELS = True
+except ImportError:
+    HAS_STATSMODELS = False
+
+def _coerce_numeric(subset: pd.DataFrame) -> pd.DataFrame:
+    """pd.to_numeric(errors='coerce') on the non-numeric columns only; numeric ones pass through as-is."""
+    is_numeric = [pd.api.types.is_numeric_dtype(dtype) for dtype in subset.dtypes]
+    if all(is_numeric):
+        return subset
+    return pd.concat([col if numeric else pd.to_numeric(col, errors='coerce')
+                      for (_, col), numeric in zip(subset.items(), is_numeric)], axis=1)
+
+def _first_mode(values: np.ndarray) -> float:
+    """Smallest most frequent value, as ``Series.mode().iloc[0]`` but without building every mode."""
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return np.nan
+    uniq, counts = np.unique(values, return_counts=True)
+    return uniq[counts.argmax()]
+
+def _skew_kurt(n: np.ndarray, m2: np.ndarray, m3: np.ndarray, m4: np.ndarray):
+    """
+    Bias-corrected skewness and excess kurtosis from central moment sums,
+    with the same small-sample and zero-variance rules as pandas' skew()/kurt().
+    """
+    n = n.astype(np.float64)
+    flat = np.abs(m2) < 1e-14  # pandas zeroes out floating-point noise in the variance
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skew = (n * np.sqrt(n - 1) / (n - 2)) * (m3 / m2 ** 1.5)
+        numerator = n * (n + 1) * (n - 1) * m4
+        denominator = (n - 2) * (n - 3) * m2 ** 2
+        kurt = numerator / denominator - 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+    skew = np.where(n < 3, np.nan, np.where(flat, 0.0, skew))
+    kurt = np.where(n < 4, np.nan, np.where(flat | (denominator == 0), 0.0, kurt))
+    return skew, kurt
+
+def _ttest_power(d: float, n1: int, n2: int, paired: bool, alpha: float = 0.05) -> float:
+    """Two-sided t-test power from the noncentral t distribution (as pingouin's power_ttest/power_ttest2n)."""
+    if paired:
+        dof, nc = n1 - 1, d * np.sqrt(n1)
+    else:
+        dof, nc = n1 + n2 - 2, d * np.sqrt(n1 * n2 / (n1 + n2))
+    tcrit = stats.t.ppf(1 - alpha / 2, dof)
+    return stats.nct.sf(tcrit, dof, nc) + stats.nct.cdf(-tcrit, dof, nc)
+
+def _pairwise_pearson(target_df: pd.DataFrame):
+    """
+    Pearson r with pairwise NaN deletion (as ``DataFrame.corr``) from BLAS products.
+    Returns (r matrix, pairwise N matrix) as ndarrays.
+    """
+    A = target_df.to_numpy(dtype=np.float64)
+    M = np.isfinite(A)
+    Mf = M.astype(np.float64)
+    # Centre on the column means first so the sums of squares below stay well conditioned
+    A0 = np.where(M, A - np.nanmean(A, axis=0), 0.0)
+
+    n = Mf.T @ Mf                 # pairwise counts
+    sx = A0.T @ Mf                # sx[i, j]: sum of column i over rows where j is also present
+    sxx = (A0 * A0).T @ Mf
+    sxy = A0.T @ A0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sx.T / n
+        var = sxx - sx * sx / n
+        r = np.clip(cov / np.sqrt(var * var.T), -1.0, 1.0)
+    diag = np.diag(r).copy()
+    np.fill_diagonal(r, np.where(np.isnan(diag), np.nan, 1.0))
+    r[n < 2] = np.nan
+    return r, n.astype(np.int64)
 
 class Analyzer:
     """
@@ -19,7 +101,7 @@ class Analyzer:
         Includes: N, Mean, Median, Mode, Std Dev, MAD, Variance, Min, Max, Range, Sum, Skewness, Kurtosis.
         """
         if columns:
-            target_df = df[columns].apply(pd.to_numeric, errors='coerce')
+            target_df = _coerce_numeric(df[columns])
         else:
             target_df = df.select_dtypes(include=[np.number])
         
@@ -29,33 +111,35 @@ class Analyzer:
         if target_df.empty:
              return pd.DataFrame()
 
-        # Build comprehensive stats
-        stats_dict = {}
-        for col in target_df.columns:
-            col_data = target_df[col].dropna()
-            if len(col_data) == 0:
-                continue
-            
-            mode_result = col_data.mode()
-            mode_val = mode_result.iloc[0] if len(mode_result) > 0 else np.nan
-            
-            stats_dict[col] = {
-                'N': len(col_data),
-                'Mean': col_data.mean(),
-                'Median': col_data.median(),
-                'Mode': mode_val,
-                'Std Dev': col_data.std(),
-                'MAD': (col_data - col_data.mean()).abs().mean(),  # Mean Absolute Deviation
-                'Variance': col_data.var(),
-                'Min': col_data.min(),
-                'Max': col_data.max(),
-                'Range': col_data.max() - col_data.min(),
-                'Sum': col_data.sum(),
-                'Skewness': col_data.skew(),
-                'Kurtosis': col_data.kurt()
-            }
-        
-        desc = pd.DataFrame(stats_dict).T
+        # Build comprehensive stats on one column-major array (NaNs skipped), so each
+        # column is contiguous; only the final table goes back to pandas
+        A = np.asfortranarray(target_df.to_numpy(dtype=np.float64))
+        n = (~np.isnan(A)).sum(axis=0)
+        sums = np.nansum(A, axis=0)
+        means = sums / n
+        dev = A - means
+        dev2 = dev * dev
+        m2 = np.nansum(dev2, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = m2 / (n - 1)
+        skew, kurt = _skew_kurt(n, m2, np.nansum(dev2 * dev, axis=0), np.nansum(dev2 * dev2, axis=0))
+        mins = np.nanmin(A, axis=0)
+        maxs = np.nanmax(A, axis=0)
+        desc = pd.DataFrame({
+            'N': n,
+            'Mean': means,
+            'Median': np.nanmedian(A, axis=0),
+            'Mode': [_first_mode(A[:, j]) for j in range(A.shape[1])],
+            'Std Dev': np.sqrt(variance),
+            'MAD': np.nansum(np.abs(dev), axis=0) / n,  # Mean Absolute Deviation
+            'Variance': variance,
+            'Min': mins,
+            'Max': maxs,
+            'Range': maxs - mins,
+            'Sum': sums,
+            'Skewness': skew,
+            'Kurtosis': kurt
+        }, index=target_df.columns).astype(float)
         return desc
 
     @staticmethod
@@ -65,7 +149,7 @@ class Analyzer:
         Returns a dictionary with r-values, p-values, and stars.
         """
         if columns:
-            target_df = df[columns].apply(pd.to_numeric, errors='coerce')
+            target_df = _coerce_numeric(df[columns])
         else:
             target_df = df.select_dtypes(include=[np.number])
 
@@ -75,46 +159,55 @@ class Analyzer:
         if target_df.shape[1] < 2:
             return {"error": "Need at least 2 numeric columns for correlation."}
 
-        from scipy.stats import pearsonr, spearmanr, kendalltau
-        
-        corr_matrix = target_df.corr(method=method)
-        p_matrix = pd.DataFrame(np.zeros((target_df.shape[1], target_df.shape[1])), 
-                               index=target_df.columns, columns=target_df.columns)
-        star_matrix = pd.DataFrame(np.empty((target_df.shape[1], target_df.shape[1]), dtype=str), 
-                                  index=target_df.columns, columns=target_df.columns)
-
-        for i in range(len(target_df.columns)):
-            for j in range(len(target_df.columns)):
-                if i == j:
-                    p_matrix.iloc[i, j] = 0.0
-                    star_matrix.iloc[i, j] = ""
-                    continue
-                
-                # Drop NaNs pairwise for better reliability
-                valid_data = target_df.iloc[:, [i, j]].dropna()
-                if len(valid_data) < 3:
-                     p_matrix.iloc[i, j] = 1.0
-                     star_matrix.iloc[i, j] = ""
-                     continue
-
-                if method == 'pearson':
-                    from scipy.stats import pearsonr
-                    r, p = pearsonr(valid_data.iloc[:, 0], valid_data.iloc[:, 1])
-                elif method == 'spearman':
-                    from scipy.stats import spearmanr
-                    r, p = spearmanr(valid_data.iloc[:, 0], valid_data.iloc[:, 1])
-                else: # kendall
-                    from scipy.stats import kendalltau
-                    r, p = kendalltau(valid_data.iloc[:, 0], valid_data.iloc[:, 1])
-                
-                p_matrix.iloc[i, j] = p
-                
-                # Significance stars
-                if p < 0.001: stars = "***"
-                elif p < 0.01: stars = "**"
-                elif p < 0.05: stars = "*"
-                else: stars = ""
-                star_matrix.iloc[i, j] = stars
+        if not HAS_SCIPY:
+            return {"error": "Scipy required for correlation p-values."}
+
+        if method == 'pearson':
+            r, n_pair = _pairwise_pearson(target_df)
+            corr_matrix = pd.DataFrame(r, index=target_df.columns, columns=target_df.columns)
+
+            # Closed-form p-values for the whole matrix: t = r * sqrt(dof / (1 - r^2)),
+            # with the same pairwise N that pearsonr would see after dropna.
+            dof = n_pair - 2
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t_stat = r * np.sqrt(dof / np.clip(1 - r ** 2, 1e-300, None))
+                p = 2 * t_dist.sf(np.abs(t_stat), dof)
+            p[n_pair < 3] = 1.0
+            np.fill_diagonal(p, 0.0)
+        else:
+            corr_matrix = target_df.corr(method=method)
+            # Plain array stores in the loop; wrapped into a DataFrame once below.
+            # Both tests are symmetric, so only the upper triangle is computed and mirrored
+            # (the diagonal stays 0).
+            k = target_df.shape[1]
+            p = np.zeros((k, k))
+
+            # NaN mask and pairwise counts computed once instead of a dropna() per pair
+            values = target_df.to_numpy(dtype=np.float64)
+            valid = ~np.isnan(values)
+            n_pair = valid.T.astype(np.int32) @ valid.astype(np.int32)
+
+            for i in range(k):
+                for j in range(i + 1, k):
+                    if n_pair[i, j] < 3:
+                         p[i, j] = p[j, i] = 1.0
+                         continue
+
+                    # Drop NaNs pairwise for better reliability
+                    both = valid[:, i] & valid[:, j]
+                    x, y = values[both, i], values[both, j]
+                    if method == 'spearman':
+                        _, p_val = spearmanr(x, y)
+                    else: # kendall
+                        _, p_val = kendalltau(x, y)
+                    p[i, j] = p[j, i] = p_val
+
+        p_matrix = pd.DataFrame(p, index=target_df.columns, columns=target_df.columns)
+
+        # Significance stars, assigned in one pass over the p-value matrix
+        stars = np.select([p < 0.001, p < 0.01, p < 0.05], ["***", "**", "*"], default="")
+        np.fill_diagonal(stars, "")
+        star_matrix = pd.DataFrame(stars, index=target_df.columns, columns=target_df.columns)
 
         return {
             "r_values": corr_matrix,
@@ -128,7 +221,7 @@ class Analyzer:
         """
         Run T-test (Independent or Paired).
         """
-        if not HAS_ADVANCED_STATS:
+        if not HAS_SCIPY:
             return {"error": "Advanced statistics libraries (pingouin/scipy) are not installed."}
 
         # Data Cleaning: Convert to numeric, coercion errors to NaN
@@ -141,21 +234,28 @@ class Analyzer:
                 "error": f"T-Test requires exactly 2 groups. Found {len(groups)} groups: {list(groups)[:5]}. Check your data cleaning."
             }
             
-        g1 = clean_df[clean_df[group_col] == groups[0]][value_col]
-        g2 = clean_df[clean_df[group_col] == groups[1]][value_col]
+        g1 = clean_df[clean_df[group_col] == groups[0]][value_col].to_numpy(dtype=float)
+        g2 = clean_df[clean_df[group_col] == groups[1]][value_col].to_numpy(dtype=float)
+        n1, n2 = len(g1), len(g2)
         
-        import pingouin as pg
-        res = pg.ttest(g1, g2, paired=paired)
+        if paired:
+            res = stats.ttest_rel(g1, g2)
+        else:
+            # Welch's correction when group sizes differ (pingouin's correction='auto')
+            res = stats.ttest_ind(g1, g2, equal_var=(n1 == n2))
+        
+        # Cohen's d on the pooled standard deviation, reported as a magnitude
+        pooled_sd = np.sqrt(((n1 - 1) * g1.var(ddof=1) + (n2 - 1) * g2.var(ddof=1)) / (n1 + n2 - 2))
+        cohen_d = abs(g1.mean() - g2.mean()) / pooled_sd
         
         return {
             "test": "Paired T-test" if paired else "Independent T-test",
             "groups": {str(groups[0]): g1.mean(), str(groups[1]): g2.mean()},
-            "t_val": res['T'].values[0],
-            "p_val": res['p-val'].values[0],
-            "dof": res['dof'].values[0],
-            "cohen_d": res['cohen-d'].values[0] if 'cohen-d' in res else None,
-            "power": res['power'].values[0] if 'power' in res else None,
-            "full_result": res
+            "t_val": res.statistic,
+            "p_val": res.pvalue,
+            "dof": res.df,
+            "cohen_d": cohen_d,
+            "power": _ttest_power(cohen_d, n1, n2, paired)
         }
 
     @staticmethod
@@ -163,10 +263,9 @@ class Analyzer:
         """
         One-way ANOVA.
         """
-        if not HAS_ADVANCED_STATS:
+        if not HAS_PINGOUIN:
             return pd.DataFrame() # Empty if no libs
 
-        import pingouin as pg
         aov = pg.anova(data=df, dv=dv, between=between)
         return aov
 
@@ -176,7 +275,7 @@ class Analyzer:
         Run Multiple Regression (Simple, Multiple, or Binary Logistic).
         Automatically encodes categorical variables.
         """
-        if not HAS_ADVANCED_STATS:
+        if not HAS_STATSMODELS:
             return {"error": "Statsmodels is not installed."}
 
         # Work with a copy
@@ -190,15 +289,20 @@ class Analyzer:
         
         # Encode categorical variables
         encoded_info = []
+        categorical_cols = set(work_df.select_dtypes(include=['object', 'string', 'category']).columns)
         for col in x_cols + [y_col]:
-            if work_df[col].dtype == 'object' or str(work_df[col].dtype) == 'category':
-                # Label encode categorical variables
-                from sklearn.preprocessing import LabelEncoder
-                le = LabelEncoder()
-                # Fill NaN with placeholder before encoding
-                work_df[col] = work_df[col].fillna('_missing_')
-                work_df[col] = le.fit_transform(work_df[col].astype(str))
-                encoded_info.append(f"{col}: {dict(zip(le.classes_, le.transform(le.classes_)))}")
+            if col in categorical_cols:
+                # Label encode categorical variables straight from the column's categories
+                cat = pd.Categorical(work_df[col])
+                codes = cat.codes.astype(np.int32)
+                labels = dict(zip(cat.categories, range(len(cat.categories))))
+                # NaN comes back as code -1; give it its own code after the real categories
+                missing = codes == -1
+                if missing.any():
+                    codes[missing] = len(cat.categories)
+                    labels['_missing_'] = len(cat.categories)
+                work_df[col] = codes
+                encoded_info.append(f"{col}: {labels}")
             else:
                 # Try to convert to numeric
                 work_df[col] = pd.to_numeric(work_df[col], errors='coerce')
@@ -212,7 +316,6 @@ class Analyzer:
         X = clean_df[x_cols]
         y = clean_df[y_col]
         
-        import statsmodels.api as sm
         X = sm.add_constant(X)
         
         try:
@@ -252,10 +355,9 @@ class Analyzer:
         """
         Calculate Cronbach's Alpha reliability.
         """
-        if not HAS_ADVANCED_STATS:
+        if not HAS_PINGOUIN:
             return {"error": "Pingouin required for Cronbach Alpha."}
             
-        import pingouin as pg
         alpha = pg.cronbach_alpha(data=df[columns])
         return {
             "alpha": alpha[0],
@@ -268,11 +370,10 @@ class Analyzer:
         """
         Chi-square test of independence.
         """
-        if not HAS_ADVANCED_STATS:
+        if not HAS_SCIPY:
             return {"error": "Scipy required for Chi-square."}
             
         contingency = pd.crosstab(df[col1], df[col2])
-        from scipy import stats
         chi2, p, dof, expected = stats.chi2_contingency(contingency)
         
         return {
@@ -287,41 +388,63 @@ class Analyzer:
         """
         Run Mann-Whitney U or Wilcoxon.
         """
-        if not HAS_ADVANCED_STATS:
+        if not HAS_SCIPY:
             return {"error": "Pingouin/Scipy required."}
             
         groups = df[group_col].dropna().unique()
         if len(groups) != 2:
             return {"error": f"Required 2 groups, found {len(groups)}."}
 
-        g1 = df[df[group_col] == groups[0]][value_col]
-        g2 = df[df[group_col] == groups[1]][value_col]
+        g1 = df[df[group_col] == groups[0]][value_col].to_numpy(dtype=float)
+        g2 = df[df[group_col] == groups[1]][value_col].to_numpy(dtype=float)
         
-        import pingouin as pg
         if test == 'mann-whitney':
-            res = pg.mwu(g1, g2)
+            g1, g2 = g1[~np.isnan(g1)], g2[~np.isnan(g2)]
+            res = stats.mannwhitneyu(g1, g2, alternative='two-sided')
+            u_val = res.statistic
+            n_pairs = len(g1) * len(g2)
+            return {
+                "U-val": u_val,
+                "alternative": "two-sided",
+                "p-val": res.pvalue,
+                "RBC": 1 - 2 * (n_pairs - u_val) / n_pairs,
+                # Vargha-Delaney A: share of (g1, g2) pairs with g1 > g2, ties counted as half
+                "CLES": u_val / n_pairs
+            }
         else: # wilcoxon
-            res = pg.wilcoxon(g1, g2)
-            
-        return res.to_dict(orient='records')[0]
+            if len(g1) != len(g2):
+                return {"error": f"Wilcoxon needs paired groups of equal size, got {len(g1)} and {len(g2)}."}
+            valid = ~(np.isnan(g1) | np.isnan(g2))
+            g1, g2 = g1[valid], g2[valid]
+            res = stats.wilcoxon(g1, g2, correction=True)
+            # CLES over all (g1, g2) pairs as for Mann-Whitney; U1 from the pooled ranks
+            # rather than an n x n difference matrix
+            n = len(g1)
+            u1 = stats.rankdata(np.concatenate([g1, g2]))[:n].sum() - n * (n + 1) / 2
+            # Matched-pairs rank-biserial correlation
+            diff = g1 - g2
+            diff = diff[diff != 0]
+            ranks = stats.rankdata(np.abs(diff))
+            r_plus, r_minus = ranks[diff > 0].sum(), ranks[diff < 0].sum()
+            return {
+                "W-val": res.statistic,
+                "alternative": "two-sided",
+                "p-val": res.pvalue,
+                "RBC": (r_plus - r_minus) / (r_plus + r_minus),
+                "CLES": u1 / (n * n)
+            }
 
     @staticmethod
     def run_logistic_regression(df: pd.DataFrame, x_cols: List[str], y_col: str) -> Dict[str, Any]:
         """
         Binary Logistic Regression with Crude and Adjusted Odds Ratios.
         """
-        if not HAS_ADVANCED_STATS:
+        if not HAS_STATSMODELS:
             return {"error": "Statsmodels required for Logistic Regression."}
             
-        import statsmodels.api as sm
-        import numpy as np
-        
         # Data Cleaning
         cols_to_use = [y_col] + x_cols
-        clean_df = df[cols_to_use].copy()
-        for col in cols_to_use:
-            clean_df[col] = pd.to_numeric(clean_df[col], errors='coerce')
-        clean_df = clean_df.dropna()
+        clean_df = _coerce_numeric(df[cols_to_use]).dropna()
         
         if len(clean_df) < 10: # Rule of thumb
             return {"error": f"Insufficient data. Need more observations (got {len(clean_df)})."}
@@ -394,7 +517,8 @@ class Analyzer:
         """
         try:
             freq = df[column].value_counts(dropna=False)
-            pct = df[column].value_counts(normalize=True, dropna=False) * 100
+            total = freq.sum()
+            pct = freq / total * 100
             
             result_df = pd.DataFrame({
                 'Count': freq,
@@ -404,7 +528,7 @@ class Analyzer:
             
             # Add total row
             total_row = pd.DataFrame({
-                'Count': [freq.sum()],
+                'Count': [total],
                 'Percent': [100.0],
                 'Cumulative %': [100.0]
             }, index=['TOTAL'])
@@ -414,7 +538,7 @@ class Analyzer:
             return {
                 "table": result_df,
                 "n_categories": len(freq),
-                "n_observations": freq.sum(),
+                "n_observations": total,
                 "mode": freq.idxmax() if not freq.empty else None
             }
         except Exception as e:
@@ -463,29 +587,18 @@ class Analyzer:
                 result["p_val"] = chi2_res["p_val"]
                 result["dof"] = chi2_res["dof"]
             
+            # Percentages are derived from the count table rather than re-running crosstab
             # Row percentages
             if show_row_pct:
-                row_pct = pd.crosstab(df[row_var], df[col_var], normalize='index', 
-                                      margins=True, margins_name='Total') * 100
-                if 'Total' in row_pct.index: row_pct = row_pct.drop('Total', axis=0)
-                if 'Total' in row_pct.columns: row_pct = row_pct.drop('Total', axis=1)
-                result["row_percentages"] = row_pct.round(2)
+                result["row_percentages"] = (ct.div(ct.sum(axis=1), axis=0) * 100).round(2)
             
             # Column percentages
             if show_col_pct:
-                col_pct = pd.crosstab(df[row_var], df[col_var], normalize='columns',
-                                      margins=True, margins_name='Total') * 100
-                if 'Total' in col_pct.index: col_pct = col_pct.drop('Total', axis=0)
-                if 'Total' in col_pct.columns: col_pct = col_pct.drop('Total', axis=1)
-                result["col_percentages"] = col_pct.round(2)
+                result["col_percentages"] = (ct.div(ct.sum(axis=0), axis=1) * 100).round(2)
             
             # Total percentages
             if show_total_pct:
-                total_pct = pd.crosstab(df[row_var], df[col_var], normalize='all',
-                                        margins=True, margins_name='Total') * 100
-                if 'Total' in total_pct.index: total_pct = total_pct.drop('Total', axis=0)
-                if 'Total' in total_pct.columns: total_pct = total_pct.drop('Total', axis=1)
-                result["total_percentages"] = total_pct.round(2)
+                result["total_percentages"] = (ct / ct.to_numpy().sum() * 100).round(2)
             
             return result
         except Exception as e:
@@ -1,6 +1,11 @@
+import re
 import pandas as pd
 from typing import Dict, Any
 
+# One "key=value" pair per comma- or newline-separated item; the value may itself contain '='
+_PAIR_RE = re.compile(r'([^=,\n]*)=([^,\n]*)')
+_NUM_RE = re.compile(r'[+-]?(?:\d+(?:\.\d*)?|\.\d+)')
+
 class DataMapper:
     """Helper for mapping variable values to labels."""
 
@@ -11,28 +16,15 @@ class DataMapper:
         Handles numeric keys and string values.
         """
         mapping = {}
-        # Split by comma or newline
-        pairs = [p.strip() for p in mapping_str.replace('\n', ',').split(',') if p.strip()]
-        
-        for pair in pairs:
-            if '=' not in pair:
-                continue
-            
-            key_str, val_str = pair.split('=', 1)
+        for key_str, val_str in _PAIR_RE.findall(mapping_str):
             key_str = key_str.strip()
-            val_str = val_str.strip()
-            
-            # Try to convert key to number (int/float)
-            try:
-                if '.' in key_str:
-                    key = float(key_str)
-                else:
-                    key = int(key_str)
-            except ValueError:
-                key = key_str # Keep as string if not number
-                
-            mapping[key] = val_str
-            
+            # Convert numeric keys to int/float, keep anything else as string
+            if _NUM_RE.fullmatch(key_str):
+                key = float(key_str) if '.' in key_str else int(key_str)
+            else:
+                key = key_str
+            mapping[key] = val_str.strip()
+
         return mapping
 
     @staticmethod
@@ -41,11 +33,14 @@ class DataMapper:
         if column not in df.columns:
             return df
             
-        df = df.copy()
-        # Ensure column type matches mapping keys (roughly)
+        # Only the mapped column is rebuilt; assign() shares the other columns instead of copying them
+        original = df[column]
         try:
-            df[column] = df[column].map(mapping).fillna(df[column])
+            # Map the distinct values only, then expand back to the rows by their codes
+            codes, uniques = pd.factorize(original, use_na_sentinel=False)
+            uniques = pd.Series(uniques)
+            mapped = uniques.map(mapping)
+            mapped = mapped.where(mapped.notna(), uniques)
+            return df.assign(**{column: mapped.take(codes).set_axis(original.index)})
         except Exception:
-            pass # Fallback if map fails types
-            
-        return df
+            return df # Fallback if map fails types
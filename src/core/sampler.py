@@ -1,11 +1,54 @@
 import math
-from typing import Dict, Union, Optional
-import statsmodels.stats.power as smp
-import statsmodels.stats.api as sms
+import functools
+from statistics import NormalDist
+from types import MappingProxyType
+from typing import Callable, Mapping, Union, Optional
+
+def _flyweight(func: Callable) -> Callable:
+    """
+    Memoizes a calculator and freezes its result, so every caller asking for
+    the same parameters shares one read-only mapping.
+    """
+    @functools.lru_cache(maxsize=1024)
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return MappingProxyType(func(*args, **kwargs))
+    return wrapper
+
+# Largest |Cohen's d| accepted; beyond it the noncentral t power turns numerically unstable
+_MAX_EFFECT_SIZE = 10.0
+# Whole-number steps taken from the closed-form estimate before deferring to statsmodels
+_MAX_POWER_STEPS = 25
+
+@functools.lru_cache(maxsize=None)
+def _ttest_ind_power():
+    """
+    statsmodels' two-sample power solver, imported on first use so that loading
+    this module (Cochran/Yamane only) does not pull in statsmodels and scipy.
+    """
+    import statsmodels.stats.power as smp
+    return smp.TTestIndPower()
+
+def _two_sample_power(effect_size: float, nobs1: int, alpha: float, ratio: float) -> float:
+    """
+    Two-sided power of the independent t-test, as TTestIndPower.power computes it.
+    The tail on the far side of the effect is set to 0 where scipy's noncentral t
+    returns NaN for it (large effects at tiny n), instead of the whole power being NaN.
+    """
+    from scipy import special
+    nobs2 = nobs1 * ratio
+    df = nobs1 + nobs2 - 2
+    nc = abs(effect_size) * math.sqrt(nobs1 * nobs2 / (nobs1 + nobs2))
+    crit = special.stdtrit(df, 1 - alpha / 2)
+    far_tail = special.nctdtr(df, nc, -crit)
+    return 1 - special.nctdtr(df, nc, crit) + (0.0 if math.isnan(far_tail) else far_tail)
 
 class Sampler:
     """
     Core calculator for sample size determination using various statistical methods.
+
+    Calculators are pure functions of their (hashable) inputs, so results are
+    memoized and returned as shared read-only mappings.
     """
     
     # Standard Z-scores for Confidence Levels
@@ -14,14 +57,17 @@ class Sampler:
         '95%': 1.96,
         '99%': 2.576
     }
+    # Squared Z-scores, so Cochran's numerator needs no pow per call
+    Z2 = {level: z * z for level, z in Z_SCORES.items()}
 
     @staticmethod
+    @_flyweight
     def calculate_cochran(
         p: float = 0.5, 
         e: float = 0.05, 
         confidence_level: str = '95%', 
         N: Optional[int] = None
-    ) -> Dict[str, Union[int, str, float]]:
+    ) -> Mapping[str, Union[int, str, float]]:
         """
         Calculates sample size using Cochran's Formula.
         
@@ -34,14 +80,8 @@ class Sampler:
         Returns:
             dict: Result with 'sample_size', 'formula', and 'description'.
         """
-        z = Sampler.Z_SCORES.get(confidence_level, 1.96)
-        
         # Cochran's Formula for Infinite Population: n0 = (Z^2 * p * q) / e^2
-        numerator = (z ** 2) * p * (1 - p)
-        denominator = e ** 2
-        n0 = numerator / denominator
-        
-        formula_desc = f"Cochran's (Infinite): ({z}^2 * {p} * {1-p}) / {e}^2"
+        n0 = Sampler.Z2.get(confidence_level, 1.96 * 1.96) * p * (1 - p) / (e * e)
         
         if N is not None:
             # Finite Population Correction: n = n0 / (1 + (n0 - 1) / N)
@@ -49,6 +89,8 @@ class Sampler:
             formula_desc = f"Cochran's (Finite Correction, N={N})"
         else:
             n = n0
+            z = Sampler.Z_SCORES.get(confidence_level, 1.96)
+            formula_desc = f"Cochran's (Infinite): ({z}^2 * {p} * {1-p}) / {e}^2"
             
         return {
             'sample_size': math.ceil(n),
@@ -60,7 +102,8 @@ class Sampler:
         }
 
     @staticmethod
-    def calculate_yamane(N: int, e: float = 0.05) -> Dict[str, Union[int, str, float]]:
+    @_flyweight
+    def calculate_yamane(N: int, e: float = 0.05) -> Mapping[str, Union[int, str, float]]:
         """
         Calculates sample size using Taro Yamane's simplified formula.
         n = N / (1 + N * e^2)
@@ -80,23 +123,47 @@ class Sampler:
              return {'error': str(ex)}
 
     @staticmethod
+    @_flyweight
     def calculate_power_ttest(
         effect_size: float = 0.5, 
         alpha: float = 0.05, 
         power: float = 0.8, 
         ratio: float = 1.0
-    ) -> Dict[str, Union[int, str, float]]:
+    ) -> Mapping[str, Union[int, str, float]]:
         """
         Calculates sample size for Independent T-Test using G*Power equivalent.
         """
         try:
-            analysis = smp.TTestIndPower()
-            n = analysis.solve_power(
-                effect_size=effect_size, 
-                alpha=alpha, 
-                power=power, 
-                ratio=ratio
-            )
+            if effect_size == 0:
+                raise ValueError("Cannot detect an effect-size of 0. Try changing your effect-size.")
+            if not (math.isfinite(effect_size) and abs(effect_size) <= _MAX_EFFECT_SIZE):
+                raise ValueError(f"Effect size must be a finite number between -{_MAX_EFFECT_SIZE:g} and {_MAX_EFFECT_SIZE:g}.")
+            if not (0 < alpha < 1 and 0 < power < 1):
+                raise ValueError("Alpha and power must be between 0 and 1.")
+            if not (math.isfinite(ratio) and ratio > 0):
+                raise ValueError("Group size ratio must be a positive number.")
+            # Closed-form normal approximation (with Guenther's small-sample term) as the
+            # starting point, instead of root-finding on the noncentral t CDF
+            z = NormalDist()
+            z_alpha, z_beta = z.inv_cdf(1 - alpha / 2), z.inv_cdf(power)
+            n_approx = (1 + 1 / ratio) * ((z_alpha + z_beta) / effect_size) ** 2 + z_alpha ** 2 / 4
+            
+            # Then step to the smallest whole group size with exact t-test power >= target;
+            # the approximation is usually exact or one off, so this is one or two power evaluations
+            def achieves(nobs1):
+                return _two_sample_power(effect_size, nobs1, alpha, ratio) >= power
+            start = n = max(2, math.ceil(n_approx))
+            while not achieves(n) and n - start < _MAX_POWER_STEPS:
+                n += 1
+            if n - start < _MAX_POWER_STEPS:
+                while n > 2 and start - n < _MAX_POWER_STEPS and achieves(n - 1):
+                    n -= 1
+            else:
+                # Power did not settle near the estimate (e.g. NaN from the noncentral t);
+                # let statsmodels' bounded root-finder decide
+                n = _ttest_ind_power().solve_power(effect_size=effect_size, alpha=alpha, power=power, ratio=ratio)
+                if not math.isfinite(n):
+                    raise ValueError("No sample size reaches the requested power for these settings.")
             
             return {
                 'sample_size': math.ceil(n), # Per group
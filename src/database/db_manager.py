@@ -1,4 +1,5 @@
 import os
+from contextlib import contextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, joinedload
 from src.database.models import Base, User, Plan, Task
@@ -85,6 +86,25 @@ class DatabaseManager:
     def get_session(self):
         return self.Session()
 
+    @contextmanager
+    def session_scope(self):
+        """Session that commits on success, rolls back on error and is always closed."""
+        session = self.Session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def prewarm(self):
+        """Checks out and returns one pooled connection so the next query skips connection setup."""
+        from sqlalchemy import text
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
     def seed_plans(self):
         import json
         session = self.get_session()
@@ -317,20 +337,29 @@ class DatabaseManager:
         return user
 
     def create_user(self, telegram_id: int, **kwargs):
-        session = self.get_session()
-        free_plan = session.query(Plan).filter(Plan.name == "Free").first()
-        expiry = datetime.utcnow() + timedelta(days=365)
-        user = User(
-            telegram_id=telegram_id, 
-            plan_id=free_plan.id, 
-            subscription_expiry=expiry,
-            **kwargs
-        )
-        session.add(user)
-        session.commit()
-        user = session.query(User).options(joinedload(User.plan)).filter(User.telegram_id == telegram_id).first()
-        session.close()
-        return user
+        with self.session_scope() as session:
+            free_plan = session.query(Plan).filter(Plan.name == "Free").first()
+            expiry = datetime.utcnow() + timedelta(days=365)
+            user = User(
+                telegram_id=telegram_id, 
+                plan_id=free_plan.id, 
+                subscription_expiry=expiry,
+                **kwargs
+            )
+            session.add(user)
+            session.flush()
+        return self.get_user(telegram_id)
+
+    def create_users_bulk(self, rows: list) -> int:
+        """Create many users (dicts of create_user kwargs) in a single transaction."""
+        with self.session_scope() as session:
+            free_plan = session.query(Plan).filter(Plan.name == "Free").first()
+            expiry = datetime.utcnow() + timedelta(days=365)
+            session.add_all([
+                User(plan_id=free_plan.id, subscription_expiry=expiry, **row)
+                for row in rows
+            ])
+        return len(rows)
 
     def update_user_profile(self, telegram_id: int, **kwargs):
         session = self.get_session()
@@ -7,7 +7,10 @@ from unittest.mock import MagicMock, AsyncMock
 # Add current directory to path
 sys.path.append(os.getcwd())
 
+import numpy as np
+
 from src.core.file_manager import FileManager
+from src.core.analyzer import Analyzer
 from src.bot.interview import InterviewManager
 from src.bot.handlers import get_column_markup
 
@@ -35,6 +38,73 @@ class TestFixes(unittest.TestCase):
         self.assertIn('Sex (Duplicate 1)', cols)
         self.assertIn('Sex (Duplicate 2)', cols)
 
+    def test_clean_data_int_arithmetic(self):
+        print("\nTesting Integer Arithmetic After Cleaning...")
+        # Small non-negative ints (0/1 outcome, 1-5 scores) must not end up in a type that wraps
+        rng = np.random.default_rng(0)
+        n = 200
+        pre = rng.integers(100, 150, n)
+        df = pd.DataFrame({
+            'pre': pre,
+            'post': pre - rng.integers(0, 120, n),
+            'x1': rng.integers(1, 6, n),
+            'x2': rng.integers(0, 50, n),
+        })
+        df['y'] = (df['x1'] + rng.normal(0, 1.5, n) > 3).astype('int64')
+        
+        cleaned = FileManager.clean_data(df.copy())
+        self.assertTrue(((cleaned['post'] - cleaned['pre']) == (df['post'] - df['pre'])).all())
+        self.assertTrue(((cleaned['x1'] - 6) == (df['x1'] - 6)).all())
+        
+        raw_fit = Analyzer.run_logistic_regression(df, ['x1', 'x2'], 'y')
+        clean_fit = Analyzer.run_logistic_regression(cleaned, ['x1', 'x2'], 'y')
+        print(f"Logit AIC raw={raw_fit['aic']:.3f} cleaned={clean_fit['aic']:.3f}")
+        self.assertTrue(np.isfinite(clean_fit['pseudo_r2']))
+        self.assertAlmostEqual(clean_fit['aic'], raw_fit['aic'], places=6)
+        self.assertAlmostEqual(clean_fit['pseudo_r2'], raw_fit['pseudo_r2'], places=9)
+        
+        raw_reg = Analyzer.run_regression(df, ['x1', 'x2'], 'y')
+        clean_reg = Analyzer.run_regression(cleaned, ['x1', 'x2'], 'y')
+        self.assertEqual(clean_reg['test_type'], "Binary Logistic Regression")
+        self.assertAlmostEqual(clean_reg['r_squared'], raw_reg['r_squared'], places=9)
+
+    def test_csv_loader_matches_pandas(self):
+        print("\nTesting CSV Loader Dtypes...")
+        # Arrow-side fix-ups: date-like text, missing booleans, columns with no values,
+        # and pandas' missing-value markers ("None", "<NA>", ...) in a numeric column
+        import tempfile
+        content = (
+            "id,when,flag,empty,note,score\n"
+            "1,2024-01-05,True,,a,None\n"
+            "2,2024-02-11,,,,<NA>\n"
+            "3,2024-03-02,False,,c,4.5\n"
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sample.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+            loaded, _ = FileManager.load_file(path)
+            expected = pd.read_csv(path)
+        print(f"Dtypes: {dict(loaded.dtypes.astype(str))}")
+        self.assertEqual(loaded['score'].dtype, 'float64')
+        self.assertEqual(list(loaded.dtypes), list(expected.dtypes))
+        self.assertTrue(loaded.equals(expected))
+
+    def test_queued_signup_not_restarted(self):
+        import asyncio
+        from src.bot import signup
+
+        async def scenario():
+            signup._PENDING_SIGNUPS[42] = asyncio.Event()
+            # Still queued when the wait times out
+            self.assertTrue(await signup.SignupManager.wait_for_signup(42, timeout=0.01))
+            # The writer finishing the row releases the waiter
+            asyncio.get_running_loop().call_later(0.01, lambda: signup._PENDING_SIGNUPS.pop(42).set())
+            self.assertFalse(await signup.SignupManager.wait_for_signup(42, timeout=1.0))
+            self.assertFalse(await signup.SignupManager.wait_for_signup(7, timeout=0.01))
+
+        asyncio.run(scenario())
+
     def test_column_markup_humanization(self):
         print("\nTesting Column Markup Humanization...")
         cols = ['Age', 'Age.1', 'Job Title.1', 'Salary']